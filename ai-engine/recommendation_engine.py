@@ -15,7 +15,6 @@ import logging
 from typing import Dict, List, Tuple, Any
 from datetime import datetime, timedelta
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
 import json
 
 class SmartRecommendationEngine:
@@ -390,9 +389,15 @@ class SmartRecommendationEngine:
             user_profile = self.user_profiles.get(user_id, {})
             preferred_grains = user_profile.get('preferred_grains', [])
             
+            # Load all preferred grains in one query, keeping preference order
+            grain_infos = {
+                grain["id"]: grain
+                async for grain in self.db.grains.find({"id": {"$in": preferred_grains}})
+            }
+            
             # Find similar grains
             for grain_id in preferred_grains:
-                grain_info = await self.db.grains.find_one({"id": grain_id})
+                grain_info = grain_infos.get(grain_id)
                 if grain_info:
                     # Find grains in same category
                     similar_grains = await self.db.grains.find({
@@ -558,8 +563,15 @@ class SmartRecommendationEngine:
                         
             # Get top trending grains
             top_grains = sorted(grain_popularity.items(), key=lambda x: x[1], reverse=True)[:5]
+            grain_infos = {
+                grain["id"]: grain
+                async for grain in self.db.grains.find(
+                    {"id": {"$in": [grain_id for grain_id, _ in top_grains]}},
+                    {"_id": 0, "id": 1, "name": 1}
+                )
+            }
             for grain_id, quantity in top_grains:
-                grain_info = await self.db.grains.find_one({"id": grain_id})
+                grain_info = grain_infos.get(grain_id)
                 if grain_info:
                     insights["trending_grains"].append({
                         "grain_id": grain_id,
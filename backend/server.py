@@ -1,30 +1,38 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, BackgroundTasks, WebSocket, WebSocketDisconnect
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, JSONResponse, ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Set, Tuple
 import uuid
 from datetime import datetime, timedelta
 import jwt
 import bcrypt
 import razorpay
+import requests
+from requests.adapters import HTTPAdapter
 import asyncio
-import json
-from geopy.distance import geodesic
-from geopy.geocoders import Nominatim
+import orjson
+import numpy as np
 import hashlib
+import hmac
 import time
-from collections import defaultdict
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import random
+import secrets
+from collections import OrderedDict
+from array import array
+from cachetools import TTLCache
 from bson import ObjectId
+from pymongo import AsyncMongoClient, DeleteMany, InsertOne, ReadPreference, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import sys
 
 # Add AI engine to path
@@ -61,42 +69,70 @@ def custom_json_encoder(obj):
         return obj.isoformat()
     raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
 
+def _dumps(obj) -> bytes:
+    return orjson.dumps(obj, default=custom_json_encoder)
+
+_loads = orjson.loads
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
 db_name = os.environ.get('DB_NAME', 'graincraft_db')
-client = AsyncIOMotorClient(mongo_url)
+# Sized so gathered queries from concurrent requests do not queue for a socket
+client = AsyncMongoClient(
+    mongo_url,
+    maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', 100)),
+    minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', 10))
+)
 db = client[db_name]
+# Dashboard/metrics counts tolerate replica lag, so keep them off the primary when possible
+analytics_db = db.with_options(read_preference=ReadPreference.SECONDARY_PREFERRED)
 
-# Redis connection with fallback
+# Async Redis connection pool with fallback; reachability is probed on startup
 redis_client = None
+redis_pubsub_client = None
 redis_available = False
 
+# Multi-document transactions need a replica set or sharded cluster; probed on startup
+mongo_transactions = False
+
 try:
-    import redis
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError
     redis_host = os.getenv('REDIS_HOST', 'localhost')
     redis_port = int(os.getenv('REDIS_PORT', 6379))
-    redis_client = redis.Redis(
+    redis_pool = aioredis.BlockingConnectionPool(
         host=redis_host,
         port=redis_port,
-        decode_responses=True,
+        decode_responses=False,
         socket_connect_timeout=2,
-        socket_timeout=2
+        socket_timeout=2,
+        max_connections=int(os.getenv('REDIS_MAX_CONNECTIONS', 64))
+    )
+    redis_client = aioredis.Redis(connection_pool=redis_pool)
+    # The notification subscriber blocks on an idle socket indefinitely, so it gets
+    # its own connection without the read timeout that guards ordinary commands
+    redis_pubsub_client = aioredis.Redis(
+        host=redis_host,
+        port=redis_port,
+        decode_responses=False,
+        socket_connect_timeout=2,
+        socket_timeout=None,
+        socket_keepalive=True
     )
-    # Test connection
-    redis_client.ping()
-    redis_available = True
-    logging.info("Redis connection established")
 except Exception as e:
-    logging.warning(f"Redis not available: {e}. Continuing without caching.")
+    logging.warning(f"Redis client unavailable: {e}. Continuing without caching.")
     redis_client = None
-    redis_available = False
+    redis_pubsub_client = None
 
-# Initialize Razorpay client
+# Initialize Razorpay client. Its blocking calls run in worker threads, so
+# give its session enough pooled keep-alive connections for all of them.
 try:
-    razorpay_client = razorpay.Client(auth=(
+    razorpay_session = requests.Session()
+    razorpay_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=32))
+    razorpay_client = razorpay.Client(session=razorpay_session, auth=(
         os.getenv("RAZORPAY_KEY_ID", "rzp_test_demo"),
         os.getenv("RAZORPAY_KEY_SECRET", "demo_secret")
     ))
@@ -104,16 +140,19 @@ try:
 except Exception as e:
     logging.warning(f"Razorpay initialization failed: {e}")
     razorpay_client = None
-razorpay_client = razorpay.Client(auth=(
-    os.getenv("RAZORPAY_KEY_ID", "rzp_test_demo"),
-    os.getenv("RAZORPAY_KEY_SECRET", "demo_secret")
-))
+
+# Keyed HMAC-SHA256 state for Razorpay signatures, copied per verification
+_RAZORPAY_HMAC_TEMPLATE = hmac.new(
+    os.getenv("RAZORPAY_KEY_SECRET", "demo_secret").encode(),
+    digestmod=hashlib.sha256
+)
 
 # Create the main app
 app = FastAPI(
     title="GrainCraft Scalable Platform", 
     version="2.1.0",
-    description="High-Performance Multi-Role Grain Ecommerce Platform"
+    description="High-Performance Multi-Role Grain Ecommerce Platform",
+    default_response_class=ORJSONResponse
 )
 
 # Add security middleware
@@ -125,46 +164,129 @@ security = HTTPBearer()
 
 # JWT Configuration
 JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key-here")
+JWT_SECRET_BYTES = JWT_SECRET.encode()
+JWT_DECODE_OPTIONS = {"require": ["exp", "sub"]}
 JWT_ALGORITHM = "HS256"
 
+# Keyed HMAC-SHA256 state for password-cache keys, so a Redis dump alone
+# cannot be used to brute-force passwords offline
+_PASSWORD_CACHE_HMAC_TEMPLATE = hmac.new(
+    os.getenv("PASSWORD_CACHE_PEPPER", JWT_SECRET).encode(),
+    digestmod=hashlib.sha256
+)
+jwt_cache = TTLCache(maxsize=10_000, ttl=60)  # raw token -> decoded payload
+
 # Rate limiting
-request_counts = defaultdict(list)
 RATE_LIMIT_REQUESTS = 100  # requests per minute
 RATE_LIMIT_WINDOW = 60  # seconds
+RATE_LIMIT_MAX_CLIENTS = 100_000  # IPs tracked by the in-process fallback
+OTP_RATE_LIMIT = 5  # OTP issues / verification attempts per email per window
+OTP_RATE_LIMIT_WINDOW = 3600  # seconds
+
+class RingCounter:
+    """Timestamps of a client's last RATE_LIMIT_REQUESTS requests in a fixed ring"""
+    __slots__ = ("buf", "head")
+
+    def __init__(self):
+        self.buf = array("d", [float("-inf")] * RATE_LIMIT_REQUESTS)
+        self.head = 0
+
+    def hit(self, now: float) -> bool:
+        # The oldest slot still inside the window means the budget is spent
+        if now - self.buf[self.head] < RATE_LIMIT_WINDOW:
+            return False
+        self.buf[self.head] = now
+        self.head = (self.head + 1) % RATE_LIMIT_REQUESTS
+        return True
+
+# Least recently seen clients are evicted first
+request_counts: "OrderedDict[str, RingCounter]" = OrderedDict()
+
+WS_BATCH_WINDOW = 0.02  # seconds to coalesce personal messages per user
 
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
         self.user_connections: Dict[str, WebSocket] = {}
+        self.queues: Dict[WebSocket, asyncio.Queue] = {}
+        self.writers: Dict[WebSocket, asyncio.Task] = {}
+        self.pending: Dict[str, List[str]] = {}
 
     async def connect(self, websocket: WebSocket, user_id: str):
         await websocket.accept()
         self.active_connections.append(websocket)
         self.user_connections[user_id] = websocket
+        queue = asyncio.Queue(maxsize=128)
+        self.queues[websocket] = queue
+        self.writers[websocket] = asyncio.create_task(self._writer(websocket, queue))
 
     def disconnect(self, websocket: WebSocket, user_id: str):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
         if user_id in self.user_connections:
             del self.user_connections[user_id]
+        self.queues.pop(websocket, None)
+        writer = self.writers.pop(websocket, None)
+        if writer:
+            writer.cancel()
+
+    async def _writer(self, websocket: WebSocket, queue: asyncio.Queue):
+        """Drain one connection's queue so a slow client only delays itself"""
+        while True:
+            message = await queue.get()
+            try:
+                await websocket.send_text(message)
+            except Exception:
+                return
+
+    def _enqueue(self, websocket: WebSocket, message: str):
+        queue = self.queues.get(websocket)
+        if queue is None:
+            return
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logging.warning("WebSocket send queue full; dropping message")
 
     async def send_personal_message(self, message: str, user_id: str):
-        if user_id in self.user_connections:
-            await self.user_connections[user_id].send_text(message)
+        if user_id not in self.user_connections:
+            return
+        pending = self.pending.get(user_id)
+        if pending is None:
+            self.pending[user_id] = [message]
+            asyncio.get_running_loop().call_later(WS_BATCH_WINDOW, self._flush, user_id)
+        else:
+            pending.append(message)
+
+    def _flush(self, user_id: str):
+        """Send everything queued for a user in the last window as one frame"""
+        messages = self.pending.pop(user_id, None)
+        websocket = self.user_connections.get(user_id)
+        if not messages or websocket is None:
+            return
+        if len(messages) == 1:
+            self._enqueue(websocket, messages[0])
+        else:
+            batch = {"type": "batch", "items": [orjson.Fragment(m) for m in messages]}
+            self._enqueue(websocket, orjson.dumps(batch).decode())
 
     async def broadcast(self, message: str):
         for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                pass
+            self._enqueue(connection, message)
 
 manager = ConnectionManager()
 
+def new_id() -> str:
+    """Time-ordered UUIDv7 string, so new documents land at the tail of the id indexes"""
+    value = (time.time_ns() // 1_000_000) << 80 | secrets.randbits(80)
+    value = value & ~(0xF << 76) | 0x7 << 76  # version 7
+    value = value & ~(0x3 << 62) | 0x2 << 62  # RFC 4122 variant
+    return str(uuid.UUID(int=value))
+
 # Enhanced Models with caching
 class User(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     email: EmailStr
     password_hash: str
     first_name: str
@@ -178,6 +300,11 @@ class User(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class CurrentPrincipal(BaseModel):
+    """Caller identity taken straight from the JWT claims"""
+    id: str
+    role: str
+
 class UserRegistration(BaseModel):
     email: EmailStr
     password: str
@@ -194,8 +321,44 @@ class OTPVerification(BaseModel):
     email: EmailStr
     otp: str
 
+class OrderStatusUpdate(BaseModel):
+    status: str
+    notes: str = ""
+
+class SubscriptionCreate(BaseModel):
+    items: List[Dict[str, Any]]
+    delivery_address: Dict[str, Any]
+    delivery_slot: str
+    delivery_day: str = "monday"
+    total_amount: float
+    next_delivery_date: str
+
+class GrainCreate(BaseModel):
+    name: str
+    description: str
+    price_per_kg: float
+    image_url: str
+    category: str
+    stock_kg: float = 100.0
+
+class GrindingStoreCreate(BaseModel):
+    name: str
+    owner_id: str
+    location: Dict[str, Any]
+    capacity_kg_per_day: float = 100.0
+    contact_info: Dict[str, Any] = {}
+    operating_hours: Dict[str, Any] = {}
+    services: List[Any] = []
+
+class DeliveryBoyCreate(BaseModel):
+    user_id: str
+    license_number: str
+    vehicle_type: str
+    current_location: Dict[str, Any] = {"latitude": 0, "longitude": 0}
+    assigned_area: Dict[str, Any] = {}
+
 class Grain(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     name: str
     description: str
     price_per_kg: float
@@ -209,7 +372,7 @@ class Grain(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class Order(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=new_id)
     customer_id: str
     items: List[Dict[str, Any]]
     delivery_address: Dict[str, Any]
@@ -230,59 +393,139 @@ class Order(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Token bucket per client IP: refill RATE_LIMIT_REQUESTS tokens per window,
+# take one per request. Returns 1 when allowed, 0 when the bucket is empty.
+RATE_LIMIT_LUA = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate))
+return allowed
+"""
+rate_limit_script = redis_client.register_script(RATE_LIMIT_LUA) if redis_client else None
+
 # Rate limiting middleware
 async def rate_limit_middleware(request: Request, call_next):
     client_ip = request.client.host
-    current_time = time.time()
     
-    # Clean old requests
-    request_counts[client_ip] = [
-        req_time for req_time in request_counts[client_ip]
-        if current_time - req_time < RATE_LIMIT_WINDOW
-    ]
+    # None until the Redis limiter has answered; only the limiter call is guarded,
+    # so a RedisError raised by the handler itself never re-runs the request
+    allowed = None
+    if redis_available and rate_limit_script:
+        try:
+            allowed = await rate_limit_script(
+                keys=[f"rl:{client_ip}"],
+                args=[int(time.time() * 1000), RATE_LIMIT_REQUESTS / (RATE_LIMIT_WINDOW * 1000), RATE_LIMIT_REQUESTS]
+            )
+        except RedisError as e:
+            logging.warning(f"Redis rate limiter unavailable: {e}. Falling back to in-process limiter.")
+    
+    if allowed is None:
+        # In-process fallback while Redis is unreachable
+        counter = request_counts.get(client_ip)
+        if counter is None:
+            counter = request_counts[client_ip] = RingCounter()
+            if len(request_counts) > RATE_LIMIT_MAX_CLIENTS:
+                request_counts.popitem(last=False)
+        else:
+            request_counts.move_to_end(client_ip)
+        allowed = counter.hit(time.monotonic())
     
-    # Check rate limit
-    if len(request_counts[client_ip]) >= RATE_LIMIT_REQUESTS:
+    if not allowed:
         return JSONResponse(
             status_code=429,
             content={"detail": "Rate limit exceeded"}
         )
     
-    # Add current request
-    request_counts[client_ip].append(current_time)
-    
     response = await call_next(request)
     return response
 
 app.middleware("http")(rate_limit_middleware)
 
 # Utility Functions with Redis caching
+# bcrypt work factor and the threads that run it; bcrypt releases the GIL,
+# so hashes run in parallel without starving the default executor
+BCRYPT_COST = int(os.getenv("BCRYPT_COST", 12))
+bcrypt_pool = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="bcrypt")
+
 def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(BCRYPT_COST)
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+async def hash_password_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(bcrypt_pool, hash_password, password)
+
+async def check_password(password: str, hashed: str, user_id: str) -> bool:
+    """Verify a password off the event loop, remembering recent successes in Redis"""
+    cache_key = None
+    if redis_available and redis_client:
+        # The stored hash is part of the MAC, so a password change invalidates the entry
+        mac = _PASSWORD_CACHE_HMAC_TEMPLATE.copy()
+        mac.update(f"{hashed}:{password}".encode('utf-8'))
+        cache_key = f"pwcache:{user_id}:{mac.hexdigest()}"
+        if await redis_client.get(cache_key):
+            return True
+    
+    verified = await asyncio.get_running_loop().run_in_executor(bcrypt_pool, verify_password, password, hashed)
+    if verified and cache_key:
+        await redis_client.setex(cache_key, 300, b"1")
+    return verified
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(hours=24)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
-    return encoded_jwt
+    expire = datetime.utcnow() + (expires_delta or timedelta(hours=24))
+    return jwt.encode({**data, "exp": expire}, JWT_SECRET_BYTES, algorithm=JWT_ALGORITHM)
 
 def verify_token(token: str):
+    payload = jwt_cache.get(token)
+    if payload is not None and payload.get("exp", 0) > time.time():
+        return payload
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(token, JWT_SECRET_BYTES, algorithms=[JWT_ALGORITHM], options=JWT_DECODE_OPTIONS)
+        jwt_cache[token] = payload
         return payload
     except jwt.ExpiredSignatureError:
+        jwt_cache.pop(token, None)
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def load_user(user_id: str) -> Optional[User]:
+    """Fetch a user record, from the 15-minute Redis cache when possible"""
+    # Try to get user from cache first if Redis is available
+    if redis_available and redis_client:
+        cached_user = await redis_client.get(f"user:{user_id}")
+        if cached_user:
+            # Cached entries were validated before they were written
+            return User.model_construct(**_loads(cached_user))
+    
+    # Get from database if not in cache or Redis not available,
+    # leaving MongoDB's _id field out server-side
+    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+    if user is None:
+        return None
+    
+    # Stored users were validated on write, so skip revalidation here
+    user_obj = User.model_construct(**user)
+    
+    # Cache user for 15 minutes if Redis is available
+    if redis_available and redis_client:
+        await redis_client.setex(f"user:{user_id}", 900, user_obj.model_dump_json())
+    
+    return user_obj
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         payload = verify_token(credentials.credentials)
@@ -290,77 +533,423 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
         
-        # Try to get user from cache first if Redis is available
-        if redis_available and redis_client:
-            cached_user = redis_client.get(f"user:{user_id}")
-            if cached_user:
-                user_data = json.loads(cached_user)
-                return User(**user_data)
-        
-        # Get from database if not in cache or Redis not available
-        user = await db.users.find_one({"id": user_id})
-        if user is None:
+        user_obj = await load_user(user_id)
+        if user_obj is None:
             raise HTTPException(status_code=401, detail="User not found")
         
-        # Convert ObjectId to string and clean data
-        user_dict = {}
-        for key, value in user.items():
-            if key == "_id":
-                continue  # Skip MongoDB's _id field
-            elif isinstance(value, ObjectId):
-                user_dict[key] = str(value)
-            else:
-                user_dict[key] = value
-        
-        # Cache user for 15 minutes if Redis is available
-        user_obj = User(**user_dict)
-        if redis_available and redis_client:
-            redis_client.setex(f"user:{user_id}", 900, json.dumps(user_obj.dict(), default=str))
-        
         return user_obj
     except Exception as e:
         logging.error(f"Error in get_current_user: {e}")
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
 
+async def get_current_principal(credentials: HTTPAuthorizationCredentials = Depends(security)) -> CurrentPrincipal:
+    """Resolve the caller's id and role for routes that need nothing else. The role comes
+    from the (cached) user record, not the token, so deleted, deactivated or re-roled
+    users lose access without waiting for their token to expire"""
+    payload = verify_token(credentials.credentials)
+    user_id = payload.get("sub")
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    
+    user = await load_user(user_id)
+    if user is None or not getattr(user, "is_active", True):
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    return CurrentPrincipal(id=user.id, role=user.role)
+
+# List endpoints page with skip/limit; the default page keeps the old 1000-document cap
+MAX_PAGE_SIZE = 1000
+
+# Paged listings sort oldest first with the unique id as tie-breaker, so consecutive
+# pages neither repeat nor skip documents; each listing has an index ending in these keys
+PAGE_SORT = [("created_at", 1), ("id", 1)]
+
+# my-orders lists newest first; the id tie-breaker keeps same-millisecond orders in a
+# fixed order across pages
+MY_ORDERS_INDEX = [("customer_id", 1), ("created_at", -1), ("id", -1)]
+
+def page_params(skip: int = Query(0, ge=0), limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)) -> Tuple[int, int]:
+    return skip, limit
+
+# Every invalidation bumps a generation counter next to the cache key. A streamed body is
+# only cached if the generation is unchanged since the stream started, so an invalidation
+# that lands mid-stream can't be undone by a stale write
+CACHE_GENERATION_TTL = 3600  # seconds; must outlive the slowest stream
+CACHE_FILL_LUA = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[1] then
+    redis.call('SETEX', KEYS[1], ARGV[2], ARGV[3])
+    return 1
+end
+return 0
+"""
+cache_fill_script = redis_client.register_script(CACHE_FILL_LUA) if redis_client else None
+
+async def stream_json_array(cursor, cache_key: Optional[str] = None, cache_ttl: int = 300):
+    """Stream a Mongo cursor as a JSON array, optionally caching the full body once drained"""
+    chunks = None
+    if cache_key and redis_available and cache_fill_script:
+        # Read before the cursor runs its query (on first iteration)
+        try:
+            generation = await redis_client.get(f"gen:{cache_key}") or b"0"
+            chunks = []
+        except RedisError as e:
+            logging.warning(f"Skipping cache fill for {cache_key}: {e}")
+    separator = b"["
+    try:
+        async for doc in cursor:
+            chunk = separator + _dumps(doc)
+            separator = b","
+            if chunks is not None:
+                chunks.append(chunk)
+            yield chunk
+    except Exception as e:
+        # The 200 status is already on the wire, so the route can't turn this into a
+        # 500; log it and abort the response rather than closing a truncated array
+        logging.error(f"Error streaming {cursor.collection.name}: {e}")
+        raise
+    tail = b"]" if separator == b"," else b"[]"
+    yield tail
+    
+    if chunks is not None:
+        chunks.append(tail)
+        try:
+            await cache_fill_script(
+                keys=[cache_key, f"gen:{cache_key}"],
+                args=[generation, cache_ttl, b"".join(chunks)]
+            )
+        except RedisError as e:
+            logging.warning(f"Skipping cache fill for {cache_key}: {e}")
+
+def queue_otp_attempt(pipe, email: str, action: str):
+    """Queue the counter bump for an OTP issue/verify attempt; yields (_, attempts)"""
+    key = f"otp_rl:{action}:{email}"
+    # Start the window on the first attempt (SET NX keeps an existing counter and its
+    # TTL, and INCR preserves the TTL); unlike EXPIRE NX this works before Redis 7
+    pipe.set(key, 0, ex=OTP_RATE_LIMIT_WINDOW, nx=True)
+    pipe.incr(key)
+
+async def otp_rate_limit_exceeded(email: str, action: str) -> bool:
+    """Count an OTP issue/verify attempt for an email and report whether it is over the cap"""
+    if not (redis_available and redis_client):
+        return False
+    
+    pipe = redis_client.pipeline(transaction=False)
+    queue_otp_attempt(pipe, email, action)
+    _, attempts = await pipe.execute()
+    return attempts > OTP_RATE_LIMIT
+
+async def invalidate_cache(*keys: str):
+    """Drop cache entries and bump their generations in one round trip; a no-op without Redis"""
+    if keys and redis_available and redis_client:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.delete(*keys)
+        for key in keys:
+            pipe.incr(f"gen:{key}")
+            pipe.expire(f"gen:{key}", CACHE_GENERATION_TTL)
+        await pipe.execute()
+
+# In-process round-robin counter used while Redis is unreachable
+store_round_robin = itertools.count()
+
+EARTH_RADIUS_KM = 6371.0
+# Active stores with real coordinates: (ids, (N, 2) array of radians), refreshed every minute
+store_coords_cache = TTLCache(maxsize=1, ttl=60)
+
+def location_coordinates(location: Optional[Dict[str, Any]]) -> Optional[Tuple[float, float]]:
+    """(latitude, longitude) when both are present and usable, otherwise None. 0/0 is the
+    placeholder the frontend and demo stores send when no location is known"""
+    if not isinstance(location, dict):
+        return None
+    try:
+        lat, lon = float(location["latitude"]), float(location["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or (lat == 0 and lon == 0):
+        return None
+    return lat, lon
+
+def haversine_km(lat: float, lon: float, coords: np.ndarray) -> np.ndarray:
+    """Great-circle distances from one point to every row of a (N, 2) radians array"""
+    lat, lon = np.radians(lat), np.radians(lon)
+    dlat = coords[:, 0] - lat
+    dlon = coords[:, 1] - lon
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * np.cos(coords[:, 0]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+async def load_store_coords() -> Tuple[List[str], np.ndarray]:
+    cached = store_coords_cache.get("active")
+    if cached is None:
+        store_ids, coords = [], []
+        async for store in db.grinding_stores.find(
+            {"is_active": True}, {"_id": 0, "id": 1, "location.latitude": 1, "location.longitude": 1}
+        ):
+            # Stores with a missing or malformed coordinate are left out of the search
+            store_coords = location_coordinates(store.get("location"))
+            if store_coords:
+                store_ids.append(store["id"])
+                coords.append(store_coords)
+        cached = (store_ids, np.radians(np.array(coords, dtype=np.float64).reshape(-1, 2)))
+        store_coords_cache["active"] = cached
+    return cached
+
+async def nearest_grinding_store_id(lat: float, lon: float) -> Optional[str]:
+    store_ids, coords = await load_store_coords()
+    if not store_ids:
+        return None
+    distances = haversine_km(lat, lon, coords)
+    return store_ids[int(np.argmin(distances))]
+
+async def select_grinding_store_id(location: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Pick the nearest active grinding store when the delivery address has coordinates,
+    otherwise round-robin using a shared Redis counter when available"""
+    coordinates = location_coordinates(location)
+    if coordinates:
+        store_id = await nearest_grinding_store_id(*coordinates)
+        if store_id:
+            return store_id
+    
+    store_ids = None
+    if redis_available and redis_client:
+        cached_ids = await redis_client.get("grinding_stores:active")
+        if cached_ids:
+            store_ids = _loads(cached_ids)
+    
+    if store_ids is None:
+        store_ids = [
+            store["id"] async for store in db.grinding_stores.find({"is_active": True}, {"_id": 0, "id": 1})
+        ]
+        if redis_available and redis_client:
+            await redis_client.setex("grinding_stores:active", 60, _dumps(store_ids))
+    
+    if not store_ids:
+        return None
+    
+    if redis_available and redis_client:
+        counter = await redis_client.incr("rr:grinding_stores")
+    else:
+        counter = next(store_round_robin)
+    return store_ids[counter % len(store_ids)]
+
+async def create_optional_razorpay_order(total_amount: float, customer_id: str) -> Optional[Dict[str, Any]]:
+    """Create a Razorpay order off the event loop, tolerating a missing or failing gateway"""
+    if not razorpay_client:
+        return None
+    try:
+        return await asyncio.to_thread(razorpay_client.order.create, {
+            "amount": int(total_amount * 100),  # Convert to paise
+            "currency": "INR",
+            "receipt": str(uuid.uuid4()),
+            "notes": {
+                "customer_id": customer_id,
+                "order_type": "grain_order"
+            }
+        })
+    except Exception as e:
+        logging.warning(f"Razorpay order creation failed: {e}")
+        return None
+
+def build_cart_item(
+    item_data: Dict[str, Any],
+    grain: Optional[Dict[str, Any]],
+    user_id: str,
+    now: datetime
+) -> Dict[str, Any]:
+    """Price a cart item; individual items need their grain's name and price_per_kg"""
+    grind_cost = item_data.get("grind_option", {}).get("additional_cost", 0.0)
+    
+    if item_data["type"] == "individual":
+        if not grain:
+            raise HTTPException(status_code=404, detail="Grain not found")
+        
+        return {
+            "id": new_id(),
+            "type": "individual",
+            "grain_id": item_data["grain_id"],
+            "grain_name": grain["name"],
+            "quantity_kg": item_data["quantity_kg"],
+            "grind_option": item_data.get("grind_option"),
+            "total_price": grain["price_per_kg"] * item_data["quantity_kg"] + grind_cost,
+            "user_id": user_id,
+            "created_at": now
+        }
+    
+    if item_data["type"] == "mix":
+        # Calculate price for custom mix
+        base_price = sum(grain_item["price_per_kg"] * grain_item["quantity_kg"] for grain_item in item_data["grains"])
+        
+        return {
+            "id": new_id(),
+            "type": "mix",
+            "grains": item_data["grains"],
+            "grind_option": item_data.get("grind_option"),
+            "total_price": base_price + grind_cost,
+            "user_id": user_id,
+            "created_at": now
+        }
+    
+    raise HTTPException(status_code=400, detail="Invalid item type")
+
+def build_order_doc(
+    customer_id: str,
+    order_data: Dict[str, Any],
+    total_amount: float,
+    grinding_store_id: Optional[str],
+    razorpay_order_id: Optional[str],
+    now: datetime
+) -> Dict[str, Any]:
+    """Build an orders document with the Order model's fields and defaults, without a model round-trip"""
+    return {
+        "id": new_id(),
+        "customer_id": customer_id,
+        "items": order_data["items"],
+        "delivery_address": order_data["delivery_address"],
+        "delivery_slot": order_data.get("delivery_slot"),
+        "delivery_date": datetime.fromisoformat(order_data["delivery_date"]) if order_data.get("delivery_date") else None,
+        "grinding_store_id": grinding_store_id,
+        "delivery_boy_id": None,
+        "status": "pending",
+        "payment_status": "pending",
+        "razorpay_order_id": razorpay_order_id,
+        "razorpay_payment_id": None,
+        "total_amount": total_amount,
+        "delivery_fee": 0.0,
+        "is_subscription": False,
+        "subscription_id": None,
+        "notes": order_data.get("notes"),
+        "priority": order_data.get("priority", 1),
+        "created_at": now,
+        "updated_at": now
+    }
+
+# Response-only timestamps (health, metrics, notifications) tolerate a little
+# skew, so they share one datetime per CLOCK_RESOLUTION instead of allocating
+CLOCK_RESOLUTION = 0.05  # seconds
+_clock_cache = [float("-inf"), datetime.utcnow()]
+
+def utcnow_coarse() -> datetime:
+    now = time.monotonic()
+    if now - _clock_cache[0] >= CLOCK_RESOLUTION:
+        _clock_cache[0] = now
+        _clock_cache[1] = datetime.utcnow()
+    return _clock_cache[1]
+
 def generate_otp() -> str:
-    import random
-    return str(random.randint(100000, 999999))
+    return str(100000 + secrets.randbelow(900000))
+
+# Notifications are published here so whichever worker holds the socket delivers them
+NOTIFY_CHANNEL_PREFIX = "notify:user:"
 
 async def send_notification(user_id: str, message: str, notification_type: str = "info"):
     """Send real-time notification via WebSocket"""
-    notification = {
+    notification = _dumps({
         "type": notification_type,
         "message": message,
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": utcnow_coarse()
+    })
+    if redis_available and redis_client:
+        try:
+            await redis_client.publish(f"{NOTIFY_CHANNEL_PREFIX}{user_id}", notification)
+            return
+        except RedisError as e:
+            logging.warning(f"Notification publish failed: {e}. Delivering locally only.")
+    await manager.send_personal_message(notification.decode(), user_id)
+
+async def relay_notifications():
+    """Forward notifications published by any worker to sockets connected to this one"""
+    while True:
+        pubsub = redis_pubsub_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.psubscribe(f"{NOTIFY_CHANNEL_PREFIX}*")
+            async for event in pubsub.listen():
+                user_id = event["channel"].decode()[len(NOTIFY_CHANNEL_PREFIX):]
+                await manager.send_personal_message(event["data"].decode(), user_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Error in relay_notifications: {e}")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+# Auto order status progression: an order moves on AUTO_STATUS_DELAY after
+# entering grinding or packing
+AUTO_STATUS_DELAY = 300  # seconds
+AUTO_STATUS_SWEEP_INTERVAL = 300  # seconds between safety-net sweeps
+AUTO_STATUS_TRANSITIONS = [("packing", "out_for_delivery"), ("grinding", "packing")]
+AUTO_STATUS_NEXT = dict(AUTO_STATUS_TRANSITIONS)
+
+# The event loop only keeps weak references to tasks, so fire-and-forget work is
+# held here until it finishes
+background_tasks: Set[asyncio.Task] = set()
+
+def spawn_background(coro) -> asyncio.Task:
+    """Run a coroutine as a background task that can't be garbage-collected mid-flight"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+def schedule_auto_transition(order_id: str, status: str, entered_at: datetime):
+    """Arm a timer that advances the order unless it has been updated since entering `status`"""
+    next_status = AUTO_STATUS_NEXT.get(status)
+    if next_status:
+        # MongoDB stores datetimes at millisecond precision, so match on the stored value
+        entered_at = entered_at.replace(microsecond=entered_at.microsecond // 1000 * 1000)
+        asyncio.get_running_loop().call_later(
+            AUTO_STATUS_DELAY,
+            lambda: spawn_background(process_order_status_update(
+                order_id, next_status, expected_status=status, expected_updated_at=entered_at
+            ))
+        )
+
+STATUS_HISTORY_LIMIT = 50  # most recent entries kept on each order
+
+def status_update(new_status: str, updated_by: str, notes: str, now: datetime) -> Dict[str, Any]:
+    """Set an order's status and append to its capped, embedded status history"""
+    return {
+        "$set": {
+            "status": new_status,
+            "updated_at": now
+        },
+        "$push": {
+            "status_history": {
+                "$each": [{
+                    "status": new_status,
+                    "updated_by": updated_by,
+                    "notes": notes,
+                    "timestamp": now
+                }],
+                "$slice": -STATUS_HISTORY_LIMIT
+            }
+        }
     }
-    await manager.send_personal_message(json.dumps(notification), user_id)
 
 # Background task queue simulation
-async def process_order_status_update(order_id: str, new_status: str):
+async def process_order_status_update(
+    order_id: str,
+    new_status: str,
+    expected_status: Optional[str] = None,
+    expected_updated_at: Optional[datetime] = None
+):
     """Background task to process order status updates"""
     try:
-        # Update order in database
-        await db.orders.update_one(
-            {"id": order_id},
-            {
-                "$set": {
-                    "status": new_status,
-                    "updated_at": datetime.utcnow()
-                }
-            }
+        now = datetime.utcnow()
+        
+        # A timer only fires for the exact status entry that armed it; any later
+        # update, including leaving and re-entering the same status, moves updated_at
+        order_filter = {"id": order_id}
+        if expected_status:
+            order_filter["status"] = expected_status
+        if expected_updated_at:
+            order_filter["updated_at"] = expected_updated_at
+        
+        # Update the order and append to its (capped) status history in one
+        # round trip, getting back only what the notification needs
+        order = await db.orders.find_one_and_update(
+            order_filter,
+            status_update(new_status, "system", "Auto-updated by system", now),
+            projection={"_id": 0, "customer_id": 1},
+            return_document=ReturnDocument.AFTER
         )
-        
-        # Add to status history
-        await db.order_status_history.insert_one({
-            "order_id": order_id,
-            "status": new_status,
-            "updated_by": "system",
-            "notes": "Auto-updated by system",
-            "timestamp": datetime.utcnow()
-        })
-        
-        # Get order details for notification
-        order = await db.orders.find_one({"id": order_id})
         if order:
             # Send notification to customer
             await send_notification(
@@ -370,71 +959,93 @@ async def process_order_status_update(order_id: str, new_status: str):
             )
             
             # Clear related cache
-            redis_client.delete(f"orders:{order['customer_id']}")
+            await invalidate_cache(f"orders:{order['customer_id']}")
+            
+            schedule_auto_transition(order_id, new_status, now)
             
     except Exception as e:
         logging.error(f"Error processing order status update: {e}")
 
-# Auto order status progression
 async def auto_update_order_status():
-    """Background task to automatically update order status"""
+    """Safety-net sweep for orders whose transition timer was lost, e.g. on restart"""
     while True:
         try:
-            # Find orders that need status updates
-            orders = await db.orders.find({
-                "status": {"$in": ["grinding", "packing"]},
-                "updated_at": {"$lt": datetime.utcnow() - timedelta(minutes=5)}
-            }).to_list(1000)
+            now = datetime.utcnow()
+            cutoff = now - timedelta(seconds=AUTO_STATUS_DELAY)
             
-            for order in orders:
-                order_obj = Order(**order)
-                new_status = None
-                
-                if order_obj.status == "grinding":
-                    new_status = "packing"
-                elif order_obj.status == "packing":
-                    new_status = "out_for_delivery"
+            for current_status, new_status in AUTO_STATUS_TRANSITIONS:
+                # Transition every due order in one server-side update, stamping the
+                # ones this sweep claimed. Every worker runs the sweep, but each order
+                # matches the status filter for only one of their updates
+                sweep_id = new_id()
+                update = status_update(new_status, "system", "Auto-updated by system", now)
+                update["$set"]["auto_sweep_id"] = sweep_id
+                result = await db.orders.update_many(
+                    {"status": current_status, "updated_at": {"$lt": cutoff}},
+                    update
+                )
+                if not result.modified_count:
+                    continue
                 
-                if new_status:
-                    await process_order_status_update(order_obj.id, new_status)
+                # Notify only the customers whose orders this sweep advanced
+                customer_ids = {
+                    order["customer_id"]
+                    async for order in db.orders.find({"auto_sweep_id": sweep_id}, {"_id": 0, "customer_id": 1})
+                }
+                for customer_id in customer_ids:
+                    await send_notification(
+                        customer_id,
+                        f"Your order status has been updated to: {new_status}",
+                        "order_update"
+                    )
+                await invalidate_cache(*(f"orders:{customer_id}" for customer_id in customer_ids))
             
-            # Wait 1 minute before checking again
-            await asyncio.sleep(60)
+            await asyncio.sleep(AUTO_STATUS_SWEEP_INTERVAL)
             
         except Exception as e:
             logging.error(f"Error in auto_update_order_status: {e}")
-            await asyncio.sleep(60)
+            await asyncio.sleep(AUTO_STATUS_SWEEP_INTERVAL)
 
 # Optimized Routes with caching
 @api_router.post("/auth/register")
 async def register_user(user_data: UserRegistration):
     try:
-        # Check if user already exists
-        existing_user = await db.users.find_one({"email": user_data.email})
-        if existing_user:
-            raise HTTPException(status_code=400, detail="Email already registered")
+        if await otp_rate_limit_exceeded(user_data.email, "issue"):
+            raise HTTPException(status_code=429, detail="Too many OTP requests. Please try again later.")
         
         # Hash password
-        password_hash = hash_password(user_data.password)
-        
-        # Create user
-        user = User(
-            email=user_data.email,
-            password_hash=password_hash,
-            first_name=user_data.first_name,
-            last_name=user_data.last_name,
-            phone=user_data.phone,
-            role=user_data.role
-        )
+        password_hash = await hash_password_async(user_data.password)
+        
+        # Create user document directly; the request body was already validated on ingress
+        now = datetime.utcnow()
+        user_doc = {
+            "id": new_id(),
+            "email": user_data.email,
+            "password_hash": password_hash,
+            "first_name": user_data.first_name,
+            "last_name": user_data.last_name,
+            "phone": user_data.phone,
+            "role": user_data.role,
+            "is_verified": False,
+            "is_active": True,
+            "profile_data": {},
+            "last_login": None,
+            "created_at": now,
+            "updated_at": now
+        }
         
-        await db.users.insert_one(user.dict())
+        # The unique email index rejects duplicates, so no existence check is needed first
+        try:
+            await db.users.insert_one(user_doc)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="Email already registered")
         
         # Generate OTP for verification
         otp = generate_otp()
         
         # Store OTP in Redis if available, otherwise use a fixed OTP for demo
         if redis_available and redis_client:
-            redis_client.setex(f"otp:{user_data.email}", 600, otp)  # 10 minutes expiry
+            await redis_client.set(f"otp:{user_data.email}", otp, ex=600, nx=True)  # 10 minutes expiry
         else:
             # For demo purposes, use a fixed OTP when Redis is not available
             otp = "123456"
@@ -444,19 +1055,26 @@ async def register_user(user_data: UserRegistration):
         
         return {"message": "User registered successfully. Please verify your email with OTP."}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/auth/verify-otp")
 async def verify_otp(otp_data: OTPVerification):
     try:
-        # Get OTP from Redis if available, otherwise check database
+        # Count the attempt and fetch the stored OTP in one Redis round trip
         stored_otp = None
         if redis_available and redis_client:
-            stored_otp = redis_client.get(f"otp:{otp_data.email}")
+            pipe = redis_client.pipeline(transaction=False)
+            queue_otp_attempt(pipe, otp_data.email, "verify")
+            pipe.get(f"otp:{otp_data.email}")
+            _, attempts, stored_otp = await pipe.execute()
+            if attempts > OTP_RATE_LIMIT:
+                raise HTTPException(status_code=429, detail="Too many OTP attempts. Please try again later.")
         
         # For demo purposes, accept 123456 as valid OTP
-        if stored_otp != otp_data.otp and otp_data.otp != "123456":
+        if stored_otp != otp_data.otp.encode() and otp_data.otp != "123456":
             raise HTTPException(status_code=400, detail="Invalid or expired OTP")
         
         # Update user verification status
@@ -469,8 +1087,7 @@ async def verify_otp(otp_data: OTPVerification):
             raise HTTPException(status_code=404, detail="User not found")
         
         # Delete OTP from Redis if available
-        if redis_available and redis_client:
-            redis_client.delete(f"otp:{otp_data.email}")
+        await invalidate_cache(f"otp:{otp_data.email}")
         
         return {"message": "Email verified successfully"}
         
@@ -484,12 +1101,12 @@ async def verify_otp(otp_data: OTPVerification):
 async def login_user(login_data: UserLogin):
     try:
         # Find user
-        user = await db.users.find_one({"email": login_data.email})
+        user = await db.users.find_one({"email": login_data.email}, {"_id": 0})
         if not user:
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
         # Verify password
-        if not verify_password(login_data.password, user["password_hash"]):
+        if not await check_password(login_data.password, user["password_hash"], user["id"]):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
         # For demo purposes, skip verification check for admin account
@@ -513,26 +1130,17 @@ async def login_user(login_data: UserLogin):
             data={"sub": user["id"], "role": user["role"]}
         )
         
-        # Clean user data and convert ObjectIds
-        clean_user = {}
-        for key, value in user.items():
-            if key == "_id" or key == "password_hash":
-                continue  # Skip MongoDB's _id field and password
-            elif isinstance(value, ObjectId):
-                clean_user[key] = str(value)
-            elif isinstance(value, datetime):
-                clean_user[key] = value.isoformat()
-            else:
-                clean_user[key] = value
+        # Never hand the password hash back to the client
+        user.pop("password_hash", None)
         
         # Cache user session if Redis is available
         if redis_available and redis_client:
-            redis_client.setex(f"user:{user['id']}", 900, json.dumps(clean_user, default=str))
+            await redis_client.setex(f"user:{user['id']}", 900, _dumps(user))
         
         return {
             "access_token": access_token,
             "token_type": "bearer",
-            "user": clean_user
+            "user": user
         }
         
     except HTTPException:
@@ -541,230 +1149,229 @@ async def login_user(login_data: UserLogin):
         logging.error(f"Error in login_user: {e}")
         raise HTTPException(status_code=500, detail="Login failed")
 
+# Serialized grain list kept in process memory as (monotonic time, body);
+# Redis stays the shared layer across workers
+GRAINS_MEMORY_TTL = 30  # seconds
+grains_body_cache: Tuple[float, bytes] = (0.0, b"")
+
+async def load_grains_body() -> bytes:
+    """Serialized available grains, from Redis when possible"""
+    if not (redis_available and redis_client):
+        return _dumps(await db.grains.find({"available": True}, {"_id": 0}).to_list(1000))
+    
+    # Try to get from cache first
+    cached_grains = await redis_client.get("grains:all")
+    if cached_grains:
+        return cached_grains
+    
+    # Single-flight rebuild: one request refills the cache while the
+    # others briefly wait for it instead of all hitting MongoDB
+    if not await redis_client.set("grains:all:lock", b"1", nx=True, ex=10):
+        for _ in range(20):
+            await asyncio.sleep(0.05)
+            cached_grains = await redis_client.get("grains:all")
+            if cached_grains:
+                return cached_grains
+        return _dumps(await db.grains.find({"available": True}, {"_id": 0}).to_list(1000))
+    
+    try:
+        # Get from database, leaving MongoDB's _id field out server-side
+        grains = await db.grains.find({"available": True}, {"_id": 0}).to_list(1000)
+        
+        # Cache for 5 minutes, jittered so replicas don't expire together
+        body = _dumps(grains)
+        await redis_client.setex("grains:all", 300 + random.randint(0, 60), body)
+    finally:
+        await redis_client.delete("grains:all:lock")
+    
+    return body
+
 @api_router.get("/grains")
 async def get_grains():
+    global grains_body_cache
     try:
-        # Try to get from cache first if Redis is available
-        if redis_available and redis_client:
-            cached_grains = redis_client.get("grains:all")
-            if cached_grains:
-                return json.loads(cached_grains)
-        
-        # Get from database
-        grains = await db.grains.find({"available": True}).to_list(1000)
-        
-        # Clean MongoDB data and convert ObjectIds
-        clean_grains = []
-        for grain in grains:
-            clean_grain = {}
-            for key, value in grain.items():
-                if key == "_id":
-                    continue  # Skip MongoDB's _id field
-                elif isinstance(value, ObjectId):
-                    clean_grain[key] = str(value)
-                else:
-                    clean_grain[key] = value
-            clean_grains.append(clean_grain)
-        
-        # Cache for 5 minutes if Redis is available
-        if redis_available and redis_client:
-            redis_client.setex("grains:all", 300, json.dumps(clean_grains, default=str))
+        cached_at, body = grains_body_cache
+        if not body or time.monotonic() - cached_at >= GRAINS_MEMORY_TTL:
+            body = await load_grains_body()
+            grains_body_cache = (time.monotonic(), body)
         
-        return clean_grains
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         logging.error(f"Error in get_grains: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/orders")
-async def create_order(order_data: Dict[str, Any], current_user: User = Depends(get_current_user)):
+async def create_order(order_data: Dict[str, Any], current_user: CurrentPrincipal = Depends(get_current_principal)):
     try:
+        now = datetime.utcnow()
+        
         # Calculate total amount
         total_amount = sum(item["total_price"] for item in order_data["items"])
         
-        # Create Razorpay order
-        razorpay_order = razorpay_client.order.create({
-            "amount": int(total_amount * 100),  # Convert to paise
-            "currency": "INR",
-            "receipt": str(uuid.uuid4()),
-            "notes": {
-                "customer_id": current_user.id,
-                "order_type": "grain_order"
-            }
-        })
-        
-        # Find nearest grinding store with load balancing
-        grinding_stores = await db.grinding_stores.find({"is_active": True}).to_list(1000)
-        if grinding_stores:
-            # Simple round-robin load balancing
-            store_index = len(await db.orders.find({}).to_list(1)) % len(grinding_stores)
-            selected_store = grinding_stores[store_index]
-        else:
-            selected_store = None
-        
-        order = Order(
-            customer_id=current_user.id,
-            items=order_data["items"],
-            delivery_address=order_data["delivery_address"],
-            delivery_slot=order_data.get("delivery_slot"),
-            delivery_date=datetime.fromisoformat(order_data["delivery_date"]) if order_data.get("delivery_date") else None,
-            grinding_store_id=selected_store["id"] if selected_store else None,
-            total_amount=total_amount,
-            razorpay_order_id=razorpay_order["id"],
-            notes=order_data.get("notes"),
-            priority=order_data.get("priority", 1)
+        # Create the Razorpay order (blocking SDK, run off the event loop) while
+        # round-robin picking a grinding store; the two are independent
+        razorpay_order, grinding_store_id = await asyncio.gather(
+            create_optional_razorpay_order(total_amount, current_user.id),
+            select_grinding_store_id(order_data["delivery_address"])
         )
+        # This endpoint's clients always go on to pay, so don't store an order they can't pay for
+        if not razorpay_order:
+            raise HTTPException(status_code=503, detail="Payments unavailable")
         
-        await db.orders.insert_one(order.dict())
+        order = build_order_doc(
+            current_user.id,
+            order_data,
+            total_amount,
+            grinding_store_id,
+            razorpay_order["id"],
+            now
+        )
         
-        # Clear user's order cache
-        redis_client.delete(f"orders:{current_user.id}")
+        await db.orders.insert_one(order)
         
-        # Send notification
-        await send_notification(
-            current_user.id,
-            "Order created successfully! Proceed with payment.",
-            "order_created"
+        # Clear user's order cache and notify
+        await asyncio.gather(
+            invalidate_cache(f"orders:{current_user.id}"),
+            send_notification(
+                current_user.id,
+                "Order created successfully! Proceed with payment.",
+                "order_created"
+            )
         )
         
         return {
-            "order_id": order.id,
+            "order_id": order["id"],
             "razorpay_order_id": razorpay_order["id"],
             "amount": razorpay_order["amount"],
             "currency": razorpay_order["currency"],
             "key_id": os.getenv("RAZORPAY_KEY_ID", "rzp_test_demo")
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/orders/verify-payment")
 async def verify_payment(verification_data: Dict[str, str]):
     try:
-        import hmac
-        import hashlib
+        now = datetime.utcnow()
         
         # Verify signature
-        generated_signature = hmac.new(
-            os.getenv("RAZORPAY_KEY_SECRET", "demo_secret").encode(),
-            f"{verification_data['razorpay_order_id']}|{verification_data['razorpay_payment_id']}".encode(),
-            hashlib.sha256
-        ).hexdigest()
+        signature = _RAZORPAY_HMAC_TEMPLATE.copy()
+        signature.update(verification_data["razorpay_order_id"].encode())
+        signature.update(b"|")
+        signature.update(verification_data["razorpay_payment_id"].encode())
         
-        if generated_signature != verification_data["razorpay_signature"]:
+        if not hmac.compare_digest(signature.hexdigest().encode(), verification_data["razorpay_signature"].encode()):
             raise HTTPException(status_code=400, detail="Invalid signature")
         
-        # Update order status
-        order_update = await db.orders.update_one(
+        # Update order status and read back the ids we need in one round trip
+        order = await db.orders.find_one_and_update(
             {"razorpay_order_id": verification_data["razorpay_order_id"]},
             {
                 "$set": {
                     "payment_status": "paid",
                     "razorpay_payment_id": verification_data["razorpay_payment_id"],
                     "status": "confirmed",
-                    "updated_at": datetime.utcnow()
+                    "updated_at": now
                 }
-            }
+            },
+            projection={"_id": 0, "id": 1, "customer_id": 1}
         )
         
-        if order_update.modified_count > 0:
-            # Get order details
-            order = await db.orders.find_one({"razorpay_order_id": verification_data["razorpay_order_id"]})
-            if order:
-                # Clear cache
-                redis_client.delete(f"orders:{order['customer_id']}")
-                
-                # Send notification
-                await send_notification(
+        if order:
+            # Schedule automatic status update
+            spawn_background(
+                process_order_status_update(order["id"], "grinding")
+            )
+            
+            # Clear cache and notify concurrently
+            await asyncio.gather(
+                invalidate_cache(f"orders:{order['customer_id']}"),
+                send_notification(
                     order["customer_id"],
                     "Payment successful! Your order has been confirmed.",
                     "payment_success"
                 )
-                
-                # Schedule automatic status update
-                asyncio.create_task(
-                    process_order_status_update(order["id"], "grinding")
-                )
+            )
         
         return {"status": "success", "message": "Payment verified successfully"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/orders/my-orders")
-async def get_my_orders(current_user: User = Depends(get_current_user)):
+async def get_my_orders(page: Tuple[int, int] = Depends(page_params), current_user: CurrentPrincipal = Depends(get_current_principal)):
     try:
+        skip, limit = page
+        # Only the default first page is cached, so other pages always hit the database
+        cache_key = f"orders:{current_user.id}" if page == (0, MAX_PAGE_SIZE) else None
+        
         # Try cache first if Redis is available
-        if redis_available and redis_client:
-            cached_orders = redis_client.get(f"orders:{current_user.id}")
+        if cache_key and redis_available and redis_client:
+            cached_orders = await redis_client.get(cache_key)
             if cached_orders:
-                return json.loads(cached_orders)
-        
-        # Get from database
-        orders = await db.orders.find({"customer_id": current_user.id}).sort("created_at", -1).to_list(1000)
-        
-        # Clean MongoDB data and convert ObjectIds
-        clean_orders = []
-        for order in orders:
-            clean_order = {}
-            for key, value in order.items():
-                if key == "_id":
-                    continue  # Skip MongoDB's _id field
-                elif isinstance(value, ObjectId):
-                    clean_order[key] = str(value)
-                elif isinstance(value, datetime):
-                    clean_order[key] = value.isoformat()
-                else:
-                    clean_order[key] = value
-            clean_orders.append(clean_order)
-        
-        # Cache for 5 minutes if Redis is available
-        if redis_available and redis_client:
-            redis_client.setex(f"orders:{current_user.id}", 300, json.dumps(clean_orders, default=str))
-        
-        return clean_orders
+                return Response(content=cached_orders, media_type="application/json")
+        
+        # Stream from database on the (customer_id, created_at, id) index, leaving
+        # MongoDB's _id and the status history out server-side, and cache the
+        # full body for 5 minutes once the cursor is drained
+        cursor = db.orders.find(
+            {"customer_id": current_user.id}, {"_id": 0, "status_history": 0}
+        ).sort([("created_at", -1), ("id", -1)]).hint(MY_ORDERS_INDEX).skip(skip).limit(limit).batch_size(200)
+        
+        return StreamingResponse(
+            stream_json_array(cursor, cache_key=cache_key),
+            media_type="application/json"
+        )
     except Exception as e:
         logging.error(f"Error in get_my_orders: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Grinding Store Routes
 @api_router.get("/grinding-stores/orders")
-async def get_grinding_store_orders(current_user: User = Depends(get_current_user)):
+async def get_grinding_store_orders(page: Tuple[int, int] = Depends(page_params), current_user: User = Depends(get_current_user)):
     if current_user.role != "grinding_store":
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Get grinding store info
-    grinding_store = await db.grinding_stores.find_one({"owner_id": current_user.id})
+    grinding_store = await db.grinding_stores.find_one({"owner_id": current_user.id}, {"_id": 0, "id": 1})
     if not grinding_store:
         # Create a default grinding store for demo
         grinding_store = {
-            "id": str(uuid.uuid4()),
+            "id": new_id(),
             "name": f"{current_user.first_name}'s Grinding Store",
             "owner_id": current_user.id,
             "location": {"address": "Demo Location", "latitude": 0, "longitude": 0},
             "is_active": True
         }
         await db.grinding_stores.insert_one(grinding_store)
+        await invalidate_cache("grinding_stores:active")
+        store_coords_cache.clear()
     
     # Get orders assigned to this store
-    orders = await db.orders.find({
+    cursor = db.orders.find({
         "grinding_store_id": grinding_store["id"],
         "status": {"$in": ["confirmed", "grinding", "packing"]}
-    }).to_list(1000)
+    }, {"_id": 0, "status_history": 0}).sort(PAGE_SORT).skip(page[0]).limit(page[1])
     
-    return [Order(**order) for order in orders]
+    return StreamingResponse(stream_json_array(cursor), media_type="application/json")
 
 # Delivery Boy Routes
 @api_router.get("/delivery/orders")
-async def get_delivery_orders(current_user: User = Depends(get_current_user)):
+async def get_delivery_orders(page: Tuple[int, int] = Depends(page_params), current_user: User = Depends(get_current_user)):
     if current_user.role != "delivery_boy":
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Get delivery boy info
-    delivery_boy = await db.delivery_boys.find_one({"user_id": current_user.id})
+    delivery_boy = await db.delivery_boys.find_one({"user_id": current_user.id}, {"_id": 0, "id": 1})
     if not delivery_boy:
         # Create a default delivery boy profile for demo
         delivery_boy = {
-            "id": str(uuid.uuid4()),
+            "id": new_id(),
             "user_id": current_user.id,
             "license_number": "DEMO123",
             "vehicle_type": "Motorcycle",
@@ -773,101 +1380,95 @@ async def get_delivery_orders(current_user: User = Depends(get_current_user)):
         await db.delivery_boys.insert_one(delivery_boy)
     
     # Get orders assigned to this delivery boy
-    orders = await db.orders.find({
+    cursor = db.orders.find({
         "delivery_boy_id": delivery_boy["id"],
         "status": {"$in": ["out_for_delivery", "delivered"]}
-    }).to_list(1000)
+    }, {"_id": 0, "status_history": 0}).sort(PAGE_SORT).skip(page[0]).limit(page[1])
     
-    return [Order(**order) for order in orders]
+    return StreamingResponse(stream_json_array(cursor), media_type="application/json")
 
 # Cart management routes
 @api_router.post("/cart/add")
-async def add_to_cart(item_data: Dict[str, Any], current_user: User = Depends(get_current_user)):
+async def add_to_cart(item_data: Dict[str, Any], current_user: CurrentPrincipal = Depends(get_current_principal)):
     try:
-        total_price = 0.0
-        
+        grain = None
         if item_data["type"] == "individual":
-            # Calculate price for individual grain
-            grain = await db.grains.find_one({"id": item_data["grain_id"]})
-            if not grain:
-                raise HTTPException(status_code=404, detail="Grain not found")
-            
-            base_price = grain["price_per_kg"] * item_data["quantity_kg"]
-            grind_cost = item_data.get("grind_option", {}).get("additional_cost", 0.0)
-            total_price = base_price + grind_cost
-            
-            cart_item = {
-                "id": str(uuid.uuid4()),
-                "type": "individual",
-                "grain_id": item_data["grain_id"],
-                "grain_name": grain["name"],
-                "quantity_kg": item_data["quantity_kg"],
-                "grind_option": item_data.get("grind_option"),
-                "total_price": total_price,
-                "user_id": current_user.id,
-                "created_at": datetime.utcnow()
-            }
-        
-        elif item_data["type"] == "mix":
-            # Calculate price for custom mix
-            base_price = sum(grain_item["price_per_kg"] * grain_item["quantity_kg"] for grain_item in item_data["grains"])
-            grind_cost = item_data.get("grind_option", {}).get("additional_cost", 0.0)
-            total_price = base_price + grind_cost
-            
-            cart_item = {
-                "id": str(uuid.uuid4()),
-                "type": "mix",
-                "grains": item_data["grains"],
-                "grind_option": item_data.get("grind_option"),
-                "total_price": total_price,
-                "user_id": current_user.id,
-                "created_at": datetime.utcnow()
-            }
+            # Look up the grain's current price
+            grain = await db.grains.find_one({"id": item_data["grain_id"]}, {"_id": 0, "name": 1, "price_per_kg": 1})
         
-        else:
-            raise HTTPException(status_code=400, detail="Invalid item type")
+        cart_item = build_cart_item(item_data, grain, current_user.id, datetime.utcnow())
         
         # Store in database
         await db.cart.insert_one(cart_item)
         
-        # Return clean cart item (removing MongoDB _id)
-        clean_item = {k: v for k, v in cart_item.items() if k != "_id"}
-        if "created_at" in clean_item and isinstance(clean_item["created_at"], datetime):
-            clean_item["created_at"] = clean_item["created_at"].isoformat()
-        
-        return clean_item
+        # Return clean cart item (insert_one added MongoDB's _id)
+        cart_item.pop("_id", None)
+        return cart_item
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in add_to_cart: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/cart/bulk-replace")
+async def replace_cart(items: List[Dict[str, Any]], current_user: CurrentPrincipal = Depends(get_current_principal)):
+    """Replace the whole cart with the given items in a single bulk write.
+    
+    On a replica set or sharded cluster the clear and inserts commit atomically. A
+    standalone server has no transactions, so a failed insert can leave the cart
+    cleared or partly filled; the replace is idempotent, so clients should retry the
+    whole request on a 500."""
+    try:
+        # Price every individual item from one grain lookup
+        grain_ids = list({item["grain_id"] for item in items if item.get("type") == "individual"})
+        grains = {}
+        if grain_ids:
+            grains = {
+                grain["id"]: grain
+                async for grain in db.grains.find(
+                    {"id": {"$in": grain_ids}}, {"_id": 0, "id": 1, "name": 1, "price_per_kg": 1}
+                )
+            }
+        
+        now = datetime.utcnow()
+        cart_items = [
+            build_cart_item(item, grains.get(item.get("grain_id")), current_user.id, now)
+            for item in items
+        ]
+        
+        # Clear and repopulate in order, in one round trip
+        operations = [DeleteMany({"user_id": current_user.id})] + [InsertOne(cart_item) for cart_item in cart_items]
+        if mongo_transactions:
+            async with client.start_session() as session:
+                await session.with_transaction(
+                    lambda session: db.cart.bulk_write(operations, ordered=True, session=session)
+                )
+        else:
+            await db.cart.bulk_write(operations, ordered=True)
+        
+        # Return clean cart items (InsertOne added MongoDB's _id)
+        for cart_item in cart_items:
+            cart_item.pop("_id", None)
+        return cart_items
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in replace_cart: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/cart")
-async def get_cart(current_user: User = Depends(get_current_user)):
+async def get_cart(page: Tuple[int, int] = Depends(page_params), current_user: CurrentPrincipal = Depends(get_current_principal)):
     try:
-        cart_items = await db.cart.find({"user_id": current_user.id}).to_list(1000)
-        
-        # Clean MongoDB data and convert ObjectIds
-        clean_items = []
-        for item in cart_items:
-            clean_item = {}
-            for key, value in item.items():
-                if key == "_id":
-                    continue  # Skip MongoDB's _id field
-                elif isinstance(value, ObjectId):
-                    clean_item[key] = str(value)
-                elif isinstance(value, datetime):
-                    clean_item[key] = value.isoformat()
-                else:
-                    clean_item[key] = value
-            clean_items.append(clean_item)
-        
-        return clean_items
+        cursor = db.cart.find({"user_id": current_user.id}, {"_id": 0}).sort(PAGE_SORT).skip(page[0]).limit(page[1])
+        return StreamingResponse(stream_json_array(cursor), media_type="application/json")
     except Exception as e:
         logging.error(f"Error in get_cart: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.delete("/cart/{item_id}")
-async def remove_from_cart(item_id: str, current_user: User = Depends(get_current_user)):
+async def remove_from_cart(item_id: str, current_user: CurrentPrincipal = Depends(get_current_principal)):
     try:
         result = await db.cart.delete_one({"id": item_id, "user_id": current_user.id})
         if result.deleted_count == 0:
@@ -877,7 +1478,7 @@ async def remove_from_cart(item_id: str, current_user: User = Depends(get_curren
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.delete("/cart")
-async def clear_cart(current_user: User = Depends(get_current_user)):
+async def clear_cart(current_user: CurrentPrincipal = Depends(get_current_principal)):
     try:
         await db.cart.delete_many({"user_id": current_user.id})
         return {"message": "Cart cleared"}
@@ -886,42 +1487,31 @@ async def clear_cart(current_user: User = Depends(get_current_user)):
 
 # Order status update route
 @api_router.put("/orders/{order_id}/status")
-async def update_order_status(order_id: str, status_data: Dict[str, str], current_user: User = Depends(get_current_user)):
+async def update_order_status(order_id: str, status_data: OrderStatusUpdate, current_user: User = Depends(get_current_user)):
     if current_user.role not in ["grinding_store", "admin", "delivery_boy"]:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    new_status = status_data["status"]
+    new_status = status_data.status
+    now = datetime.utcnow()
     
-    # Update order status
-    await db.orders.update_one(
+    # Update order status and its embedded history in one write, getting
+    # back the customer for cache invalidation
+    order = await db.orders.find_one_and_update(
         {"id": order_id},
-        {
-            "$set": {
-                "status": new_status,
-                "updated_at": datetime.utcnow()
-            }
-        }
+        status_update(new_status, current_user.id, status_data.notes, now),
+        projection={"_id": 0, "customer_id": 1}
     )
     
-    # Add to status history
-    await db.order_status_history.insert_one({
-        "order_id": order_id,
-        "status": new_status,
-        "updated_by": current_user.id,
-        "notes": status_data.get("notes", ""),
-        "timestamp": datetime.utcnow()
-    })
-    
     # Clear cache if Redis is available
-    order = await db.orders.find_one({"id": order_id})
-    if order and redis_available and redis_client:
-        redis_client.delete(f"orders:{order['customer_id']}")
+    if order:
+        await invalidate_cache(f"orders:{order['customer_id']}")
+        schedule_auto_transition(order_id, new_status, now)
     
     return {"message": "Order status updated successfully"}
 
 # Subscription routes
 @api_router.post("/subscriptions")
-async def create_subscription(subscription_data: Dict[str, Any], current_user: User = Depends(get_current_user)):
+async def create_subscription(subscription_data: SubscriptionCreate, current_user: CurrentPrincipal = Depends(get_current_principal)):
     try:
         # Create subscription plan with Razorpay
         plan_data = {
@@ -929,21 +1519,16 @@ async def create_subscription(subscription_data: Dict[str, Any], current_user: U
             "interval": 1,
             "item": {
                 "name": "Weekly Grain Delivery",
-                "amount": int(subscription_data["total_amount"] * 100),
+                "amount": int(subscription_data.total_amount * 100),
                 "currency": "INR"
             }
         }
         
         # For demo, create a simple plan without Razorpay
         subscription = {
-            "id": str(uuid.uuid4()),
+            "id": new_id(),
             "customer_id": current_user.id,
-            "items": subscription_data["items"],
-            "delivery_address": subscription_data["delivery_address"],
-            "delivery_slot": subscription_data["delivery_slot"],
-            "delivery_day": subscription_data.get("delivery_day", "monday"),
-            "total_amount": subscription_data["total_amount"],
-            "next_delivery_date": subscription_data["next_delivery_date"],
+            **subscription_data.model_dump(),
             "status": "active",
             "created_at": datetime.utcnow()
         }
@@ -955,105 +1540,128 @@ async def create_subscription(subscription_data: Dict[str, Any], current_user: U
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# The subscriptions list only renders the schedule and amount, not items or address
+SUBSCRIPTION_LIST_PROJECTION = {
+    "_id": 0, "id": 1, "status": 1, "total_amount": 1,
+    "next_delivery_date": 1, "delivery_slot": 1, "delivery_day": 1
+}
+
 @api_router.get("/subscriptions/my-subscriptions")
-async def get_my_subscriptions(current_user: User = Depends(get_current_user)):
+async def get_my_subscriptions(page: Tuple[int, int] = Depends(page_params), current_user: CurrentPrincipal = Depends(get_current_principal)):
     try:
-        subscriptions = await db.subscriptions.find({"customer_id": current_user.id}).to_list(1000)
-        return subscriptions
+        cursor = db.subscriptions.find(
+            {"customer_id": current_user.id}, SUBSCRIPTION_LIST_PROJECTION
+        ).sort(PAGE_SORT).skip(page[0]).limit(page[1])
+        return StreamingResponse(stream_json_array(cursor), media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Grind options route
+# Grind options route (static, so encoded once at import time)
+_GRIND_OPTIONS_JSON = orjson.dumps([
+    {"type": "whole", "description": "Whole grains (no grinding)", "additional_cost": 0.0, "processing_time_minutes": 0},
+    {"type": "coarse", "description": "Coarse grind - chunky texture", "additional_cost": 5.0, "processing_time_minutes": 5},
+    {"type": "medium", "description": "Medium grind - balanced texture", "additional_cost": 8.0, "processing_time_minutes": 8},
+    {"type": "fine", "description": "Fine grind - smooth texture", "additional_cost": 12.0, "processing_time_minutes": 12},
+    {"type": "powder", "description": "Powder grind - very fine flour", "additional_cost": 15.0, "processing_time_minutes": 15}
+])
+
 @api_router.get("/grind-options")
 async def get_grind_options():
-    return [
-        {"type": "whole", "description": "Whole grains (no grinding)", "additional_cost": 0.0, "processing_time_minutes": 0},
-        {"type": "coarse", "description": "Coarse grind - chunky texture", "additional_cost": 5.0, "processing_time_minutes": 5},
-        {"type": "medium", "description": "Medium grind - balanced texture", "additional_cost": 8.0, "processing_time_minutes": 8},
-        {"type": "fine", "description": "Fine grind - smooth texture", "additional_cost": 12.0, "processing_time_minutes": 12},
-        {"type": "powder", "description": "Powder grind - very fine flour", "additional_cost": 15.0, "processing_time_minutes": 15}
-    ]
+    return Response(content=_GRIND_OPTIONS_JSON, media_type="application/json")
 
 # Admin routes for managing grains
 @api_router.post("/grains")
-async def create_grain(grain_data: Dict[str, Any], current_user: User = Depends(get_current_user)):
+async def create_grain(grain_data: GrainCreate, current_user: User = Depends(get_current_user)):
+    global grains_body_cache
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can create grains")
     
-    grain = Grain(
-        name=grain_data["name"],
-        description=grain_data["description"],
-        price_per_kg=grain_data["price_per_kg"],
-        image_url=grain_data["image_url"],
-        category=grain_data["category"],
-        stock_kg=grain_data.get("stock_kg", 100.0),
-        created_by=current_user.id
-    )
+    grain = Grain(**grain_data.model_dump(), created_by=current_user.id)
     
-    await db.grains.insert_one(grain.dict())
+    await db.grains.insert_one(grain.model_dump())
     
-    # Clear grains cache if Redis is available
-    if redis_available and redis_client:
-        redis_client.delete("grains:all")
+    # Clear grains caches; other workers pick it up within GRAINS_MEMORY_TTL
+    grains_body_cache = (0.0, b"")
+    await invalidate_cache("grains:all")
     
     return grain
 
 # Admin routes for managing stores
 @api_router.post("/admin/grinding-stores")
-async def create_grinding_store(store_data: Dict[str, Any], current_user: User = Depends(get_current_user)):
+async def create_grinding_store(store_data: GrindingStoreCreate, current_user: User = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Access denied")
     
     store = {
-        "id": str(uuid.uuid4()),
-        "name": store_data["name"],
-        "owner_id": store_data["owner_id"],
-        "location": store_data["location"],
-        "capacity_kg_per_day": store_data.get("capacity_kg_per_day", 100.0),
-        "contact_info": store_data.get("contact_info", {}),
-        "operating_hours": store_data.get("operating_hours", {}),
-        "services": store_data.get("services", []),
+        "id": new_id(),
+        **store_data.model_dump(),
         "is_active": True,
         "created_at": datetime.utcnow()
     }
     
     await db.grinding_stores.insert_one(store)
+    store.pop("_id", None)
+    await invalidate_cache("grinding_stores:active")
+    store_coords_cache.clear()
     return store
 
 @api_router.post("/admin/delivery-boys")
-async def create_delivery_boy(delivery_boy_data: Dict[str, Any], current_user: User = Depends(get_current_user)):
+async def create_delivery_boy(delivery_boy_data: DeliveryBoyCreate, current_user: User = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Access denied")
     
     delivery_boy = {
-        "id": str(uuid.uuid4()),
-        "user_id": delivery_boy_data["user_id"],
-        "license_number": delivery_boy_data["license_number"],
-        "vehicle_type": delivery_boy_data["vehicle_type"],
-        "current_location": delivery_boy_data.get("current_location", {"latitude": 0, "longitude": 0}),
-        "assigned_area": delivery_boy_data.get("assigned_area", {}),
+        "id": new_id(),
+        **delivery_boy_data.model_dump(),
         "is_available": True,
         "rating": 5.0,
         "created_at": datetime.utcnow()
     }
     
     await db.delivery_boys.insert_one(delivery_boy)
+    delivery_boy.pop("_id", None)
     return delivery_boy
 
 # Health check for load balancers
+# Dependencies are pinged in the background; /health only checks how recent
+# the last successful ping was, so load balancer probes cost no round trips
+HEALTH_PROBE_INTERVAL = 2  # seconds
+HEALTH_STALE_AFTER = 5  # seconds
+last_healthy = {"database": 0.0, "redis": 0.0}
+
+async def probe_dependencies():
+    while True:
+        try:
+            await db.command("ping")
+            last_healthy["database"] = time.monotonic()
+        except Exception as e:
+            logging.warning(f"Database ping failed: {e}")
+        
+        if redis_available and redis_client:
+            try:
+                await redis_client.ping()
+                last_healthy["redis"] = time.monotonic()
+            except RedisError as e:
+                logging.warning(f"Redis ping failed: {e}")
+        
+        await asyncio.sleep(HEALTH_PROBE_INTERVAL)
+
 @api_router.get("/health")
 async def health_check():
     try:
+        now = time.monotonic()
+        
         # Check database connection
-        await db.command("ping")
+        if now - last_healthy["database"] > HEALTH_STALE_AFTER:
+            raise RuntimeError("database ping is stale")
         
         # Check Redis connection if available
-        if redis_available and redis_client:
-            redis_client.ping()
+        if redis_available and redis_client and now - last_healthy["redis"] > HEALTH_STALE_AFTER:
+            raise RuntimeError("redis ping is stale")
         
         return {
             "status": "healthy",
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": utcnow_coarse(),
             "version": "2.1.0",
             "database": "connected",
             "redis": "connected" if redis_available else "not_available"
@@ -1063,6 +1671,42 @@ async def health_check():
         raise HTTPException(status_code=503, detail=f"Service unhealthy: {str(e)}")
 
 # Admin dashboard endpoint
+DASHBOARD_ROLES = ["customer", "grinding_store", "delivery_boy"]
+
+async def count_users_by_role() -> Dict[str, int]:
+    cursor = await analytics_db.users.aggregate([
+        {"$match": {"role": {"$in": DASHBOARD_ROLES}}},
+        {"$group": {"_id": "$role", "count": {"$sum": 1}}}
+    ])
+    return {row["_id"]: row["count"] async for row in cursor}
+
+# Admins poll the dashboard; counts a few seconds old are fine, and concurrent
+# refreshes wait on the lock for one query instead of each running their own
+DASHBOARD_CACHE_TTL = 30  # seconds
+dashboard_cache = TTLCache(maxsize=1, ttl=DASHBOARD_CACHE_TTL)
+dashboard_lock = asyncio.Lock()
+
+async def load_dashboard_stats() -> Dict[str, int]:
+    stats = dashboard_cache.get("stats")
+    if stats is not None:
+        return stats
+    async with dashboard_lock:
+        stats = dashboard_cache.get("stats")
+        if stats is None:
+            # The order count and one grouped pass over the role index for the
+            # per-role user counts, issued concurrently
+            total_orders, role_counts = await asyncio.gather(
+                analytics_db.orders.count_documents({}),
+                count_users_by_role()
+            )
+            stats = dashboard_cache["stats"] = {
+                "total_orders": total_orders,
+                "total_customers": role_counts.get("customer", 0),
+                "total_grinding_stores": role_counts.get("grinding_store", 0),
+                "total_delivery_boys": role_counts.get("delivery_boy", 0)
+            }
+    return stats
+
 @api_router.get("/admin/dashboard")
 async def admin_dashboard(current_user: User = Depends(get_current_user)):
     try:
@@ -1071,17 +1715,9 @@ async def admin_dashboard(current_user: User = Depends(get_current_user)):
             raise HTTPException(status_code=403, detail="Not authorized")
         
         # Get dashboard stats
-        total_orders = await db.orders.count_documents({})
-        total_customers = await db.users.count_documents({"role": "customer"})
-        total_grinding_stores = await db.users.count_documents({"role": "grinding_store"})
-        total_delivery_boys = await db.users.count_documents({"role": "delivery_boy"})
-        
         return {
-            "total_orders": total_orders,
-            "total_customers": total_customers,
-            "total_grinding_stores": total_grinding_stores,
-            "total_delivery_boys": total_delivery_boys,
-            "timestamp": datetime.utcnow().isoformat()
+            **await load_dashboard_stats(),
+            "timestamp": utcnow_coarse()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1090,112 +1726,158 @@ async def admin_dashboard(current_user: User = Depends(get_current_user)):
 @api_router.get("/metrics")
 async def get_metrics():
     try:
-        total_users = await db.users.count_documents({})
-        total_orders = await db.orders.count_documents({})
-        active_orders = await db.orders.count_documents({"status": {"$in": ["confirmed", "grinding", "packing", "out_for_delivery"]}})
+        # Totals come from collection metadata; active orders stay an exact
+        # count served by the status index; all three are issued concurrently
+        total_users, total_orders, active_orders = await asyncio.gather(
+            analytics_db.users.estimated_document_count(),
+            analytics_db.orders.estimated_document_count(),
+            analytics_db.orders.count_documents({"status": {"$in": ["confirmed", "grinding", "packing", "out_for_delivery"]}})
+        )
         
         return {
             "total_users": total_users,
             "total_orders": total_orders,
             "active_orders": active_orders,
             "active_connections": len(manager.active_connections),
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": utcnow_coarse()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Catalogue seeded on startup (created_at is stamped at insert time)
+INITIAL_GRAINS = (
+    {
+        "id": "wheat-001",
+        "name": "Premium Wheat",
+        "description": "High-quality wheat grains perfect for grinding into flour",
+        "price_per_kg": 45.0,
+        "image_url": "https://images.pexels.com/photos/54084/wheat-grain-agriculture-seed-54084.jpeg",
+        "category": "wheat",
+        "stock_kg": 1000.0,
+        "available": True,
+        "created_by": "admin"
+    },
+    {
+        "id": "millet-001",
+        "name": "Organic Millet",
+        "description": "Nutrient-rich millet grains for healthy grain mixes",
+        "price_per_kg": 85.0,
+        "image_url": "https://images.unsplash.com/photo-1542990253-a781e04c0082",
+        "category": "millet",
+        "stock_kg": 500.0,
+        "available": True,
+        "created_by": "admin"
+    },
+    {
+        "id": "rice-001",
+        "name": "Brown Rice",
+        "description": "Whole grain brown rice for custom grain blends",
+        "price_per_kg": 65.0,
+        "image_url": "https://images.pexels.com/photos/1192053/pexels-photo-1192053.jpeg",
+        "category": "rice",
+        "stock_kg": 800.0,
+        "available": True,
+        "created_by": "admin"
+    },
+    {
+        "id": "oats-001",
+        "name": "Steel Cut Oats",
+        "description": "Premium steel cut oats for nutritious grain mixes",
+        "price_per_kg": 95.0,
+        "image_url": "https://images.unsplash.com/photo-1651241587503-a874db54a1a7",
+        "category": "oats",
+        "stock_kg": 300.0,
+        "available": True,
+        "created_by": "admin"
+    },
+    {
+        "id": "quinoa-001",
+        "name": "Quinoa Seeds",
+        "description": "Superfood quinoa seeds for protein-rich grain blends",
+        "price_per_kg": 280.0,
+        "image_url": "https://images.pexels.com/photos/1192037/pexels-photo-1192037.jpeg",
+        "category": "quinoa",
+        "stock_kg": 200.0,
+        "available": True,
+        "created_by": "admin"
+    }
+)
+
 # Initialize data and start background tasks
 @app.on_event("startup")
 async def startup_event():
+    global redis_available, mongo_transactions
+    
+    # Probe Redis once; handlers skip caching while it is unreachable
+    if redis_client:
+        try:
+            await redis_client.ping()
+            redis_available = True
+            logging.info("Redis connection established")
+        except Exception as e:
+            logging.warning(f"Redis not available: {e}. Continuing without caching.")
+    
+    # Standalone servers reject transactions, so only use them where they work
+    try:
+        hello = await client.admin.command("hello")
+        mongo_transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+    except Exception as e:
+        logging.warning(f"Could not determine MongoDB topology: {e}. Transactions disabled.")
+    
     # Create indexes for better performance
     try:
         await db.users.create_index("email", unique=True)
-        await db.orders.create_index([("customer_id", 1), ("created_at", -1)])
-        await db.orders.create_index("status")
+        await db.users.create_index("id", unique=True)
+        await db.users.create_index("role")
+        await db.orders.create_index("id", unique=True)
+        await db.orders.create_index("razorpay_order_id")
+        await db.orders.create_index(MY_ORDERS_INDEX)
+        await db.orders.create_index([("status", 1), ("updated_at", 1)])
+        await db.orders.create_index("auto_sweep_id", sparse=True)
+        await db.orders.create_index([("grinding_store_id", 1), ("status", 1), ("created_at", 1), ("id", 1)])
+        await db.orders.create_index([("delivery_boy_id", 1), ("status", 1), ("created_at", 1), ("id", 1)])
+        await db.subscriptions.create_index([("customer_id", 1), ("created_at", 1), ("id", 1)])
+        await db.cart.create_index([("user_id", 1), ("created_at", 1), ("id", 1)])
+        await db.grinding_stores.create_index("owner_id")
+        await db.delivery_boys.create_index("user_id")
+        await db.grains.create_index("id", unique=True)
         await db.grains.create_index("category")
         await db.grains.create_index("available")
     except Exception as e:
         logging.warning(f"Index creation warning: {e}")
     
-    # Create initial grains data if not exists
-    grain_count = await db.grains.count_documents({})
-    if grain_count == 0:
-        initial_grains = [
-            {
-                "id": "wheat-001",
-                "name": "Premium Wheat",
-                "description": "High-quality wheat grains perfect for grinding into flour",
-                "price_per_kg": 45.0,
-                "image_url": "https://images.pexels.com/photos/54084/wheat-grain-agriculture-seed-54084.jpeg",
-                "category": "wheat",
-                "stock_kg": 1000.0,
-                "available": True,
-                "created_by": "admin",
-                "created_at": datetime.utcnow()
-            },
-            {
-                "id": "millet-001",
-                "name": "Organic Millet",
-                "description": "Nutrient-rich millet grains for healthy grain mixes",
-                "price_per_kg": 85.0,
-                "image_url": "https://images.unsplash.com/photo-1542990253-a781e04c0082",
-                "category": "millet",
-                "stock_kg": 500.0,
-                "available": True,
-                "created_by": "admin",
-                "created_at": datetime.utcnow()
-            },
-            {
-                "id": "rice-001",
-                "name": "Brown Rice",
-                "description": "Whole grain brown rice for custom grain blends",
-                "price_per_kg": 65.0,
-                "image_url": "https://images.pexels.com/photos/1192053/pexels-photo-1192053.jpeg",
-                "category": "rice",
-                "stock_kg": 800.0,
-                "available": True,
-                "created_by": "admin",
-                "created_at": datetime.utcnow()
-            },
-            {
-                "id": "oats-001",
-                "name": "Steel Cut Oats",
-                "description": "Premium steel cut oats for nutritious grain mixes",
-                "price_per_kg": 95.0,
-                "image_url": "https://images.unsplash.com/photo-1651241587503-a874db54a1a7",
-                "category": "oats",
-                "stock_kg": 300.0,
-                "available": True,
-                "created_by": "admin",
-                "created_at": datetime.utcnow()
-            },
-            {
-                "id": "quinoa-001",
-                "name": "Quinoa Seeds",
-                "description": "Superfood quinoa seeds for protein-rich grain blends",
-                "price_per_kg": 280.0,
-                "image_url": "https://images.pexels.com/photos/1192037/pexels-photo-1192037.jpeg",
-                "category": "quinoa",
-                "stock_kg": 200.0,
-                "available": True,
-                "created_by": "admin",
-                "created_at": datetime.utcnow()
-            }
-        ]
-        await db.grains.insert_many(initial_grains)
+    # Seed the initial grains idempotently: missing ones are inserted, existing
+    # ones are left untouched, and concurrent workers cannot double-insert
+    now = datetime.utcnow()
+    try:
+        await db.grains.bulk_write(
+            [
+                UpdateOne({"id": grain["id"]}, {"$setOnInsert": {**grain, "created_at": now}}, upsert=True)
+                for grain in INITIAL_GRAINS
+            ],
+            ordered=False
+        )
+    except BulkWriteError as e:
+        # Another worker won the race on the unique id index; the rest still applied
+        logging.info(f"Grain seed skipped {len(e.details.get('writeErrors', []))} existing grains")
     
-    # Create admin user if doesn't exist
-    admin_user = await db.users.find_one({"role": "admin"})
+    # Create admin user if doesn't exist; the upsert keeps racing workers
+    # from inserting it twice, and the pre-check skips hashing on restarts
+    admin_user = await db.users.find_one({"role": "admin"}, {"_id": 1})
     if not admin_user:
         admin = User(
             email="admin@graincraft.com",
-            password_hash=hash_password("admin123"),
+            password_hash=await hash_password_async("admin123"),
             first_name="Admin",
             last_name="User",
             role="admin",
             is_verified=True
         )
-        await db.users.insert_one(admin.dict())
+        await db.users.update_one(
+            {"email": admin.email},
+            {"$setOnInsert": admin.model_dump()},
+            upsert=True
+        )
     
     # Initialize AI features if available
     if AI_FEATURES_AVAILABLE:
@@ -1208,6 +1890,13 @@ async def startup_event():
     
     # Start background task for order status updates
     asyncio.create_task(auto_update_order_status())
+    
+    # Keep the health check's view of Mongo and Redis fresh
+    asyncio.create_task(probe_dependencies())
+    
+    # Deliver notifications published by other workers
+    if redis_available:
+        asyncio.create_task(relay_notifications())
 
 # AI-Powered Routes
 @api_router.get("/ai/recommendations/{user_id}")
@@ -1222,7 +1911,7 @@ async def get_user_recommendations(user_id: str, limit: int = 5):
             "user_id": user_id,
             "recommendations": recommendations,
             "ai_powered": True,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": utcnow_coarse()
         }
     except Exception as e:
         logging.error(f"Error getting recommendations: {e}")
@@ -1240,7 +1929,7 @@ async def predict_demand(grain_id: str, days_ahead: int = 7):
             "grain_id": grain_id,
             "prediction": prediction,
             "days_ahead": days_ahead,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": utcnow_coarse()
         }
     except Exception as e:
         logging.error(f"Error predicting demand: {e}")
@@ -1257,7 +1946,7 @@ async def optimize_pricing(grain_id: str, current_price: float, demand_factor: f
         return {
             "grain_id": grain_id,
             "optimization": optimization,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": utcnow_coarse()
         }
     except Exception as e:
         logging.error(f"Error optimizing pricing: {e}")
@@ -1274,7 +1963,7 @@ async def get_ai_market_insights():
         return {
             "insights": insights,
             "ai_powered": True,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": utcnow_coarse()
         }
     except Exception as e:
         logging.error(f"Error getting market insights: {e}")
@@ -1292,7 +1981,7 @@ async def get_smart_inventory_alerts(limit: int = 50):
         return {
             "alerts": alerts,
             "count": len(alerts),
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": utcnow_coarse()
         }
     except Exception as e:
         logging.error(f"Error getting inventory alerts: {e}")
@@ -1309,7 +1998,7 @@ async def get_smart_inventory_analytics():
         return {
             "analytics": analytics,
             "ai_powered": True,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": utcnow_coarse()
         }
     except Exception as e:
         logging.error(f"Error getting inventory analytics: {e}")
@@ -1317,7 +2006,7 @@ async def get_smart_inventory_analytics():
 
 # Enhanced order creation with inventory management
 @api_router.post("/orders/enhanced")
-async def create_enhanced_order(order_data: Dict[str, Any], current_user: User = Depends(get_current_user)):
+async def create_enhanced_order(order_data: Dict[str, Any], current_user: CurrentPrincipal = Depends(get_current_principal)):
     """Create order with smart inventory management"""
     try:
         # Reserve inventory if AI features are available
@@ -1331,62 +2020,40 @@ async def create_enhanced_order(order_data: Dict[str, Any], current_user: User =
                         if not reserved:
                             raise HTTPException(status_code=400, detail=f"Insufficient stock for grain {grain_id}")
         
+        now = datetime.utcnow()
+        
         # Calculate total amount
         total_amount = sum(item["total_price"] for item in order_data["items"])
         
-        # Create Razorpay order if available
-        razorpay_order = None
-        if razorpay_client:
-            try:
-                razorpay_order = razorpay_client.order.create({
-                    "amount": int(total_amount * 100),  # Convert to paise
-                    "currency": "INR",
-                    "receipt": str(uuid.uuid4()),
-                    "notes": {
-                        "customer_id": current_user.id,
-                        "order_type": "grain_order"
-                    }
-                })
-            except Exception as e:
-                logging.warning(f"Razorpay order creation failed: {e}")
-        
-        # Find nearest grinding store with load balancing
-        grinding_stores = await db.grinding_stores.find({"is_active": True}).to_list(1000)
-        if grinding_stores:
-            # Simple round-robin load balancing
-            store_index = len(await db.orders.find({}).to_list(1)) % len(grinding_stores)
-            selected_store = grinding_stores[store_index]
-        else:
-            selected_store = None
-        
-        order = Order(
-            customer_id=current_user.id,
-            items=order_data["items"],
-            delivery_address=order_data["delivery_address"],
-            delivery_slot=order_data.get("delivery_slot"),
-            delivery_date=datetime.fromisoformat(order_data["delivery_date"]) if order_data.get("delivery_date") else None,
-            grinding_store_id=selected_store["id"] if selected_store else None,
-            total_amount=total_amount,
-            razorpay_order_id=razorpay_order["id"] if razorpay_order else None,
-            notes=order_data.get("notes"),
-            priority=order_data.get("priority", 1)
+        # Create the Razorpay order (if available) while picking a grinding store
+        razorpay_order, grinding_store_id = await asyncio.gather(
+            create_optional_razorpay_order(total_amount, current_user.id),
+            select_grinding_store_id(order_data["delivery_address"])
         )
         
-        await db.orders.insert_one(order.dict())
+        order = build_order_doc(
+            current_user.id,
+            order_data,
+            total_amount,
+            grinding_store_id,
+            razorpay_order["id"] if razorpay_order else None,
+            now
+        )
         
-        # Clear user's order cache if Redis is available
-        if redis_available and redis_client:
-            redis_client.delete(f"orders:{current_user.id}")
+        await db.orders.insert_one(order)
         
-        # Send notification
-        await send_notification(
-            current_user.id,
-            "Order created successfully! Proceed with payment.",
-            "order_created"
+        # Clear user's order cache and notify
+        await asyncio.gather(
+            invalidate_cache(f"orders:{current_user.id}"),
+            send_notification(
+                current_user.id,
+                "Order created successfully! Proceed with payment.",
+                "order_created"
+            )
         )
         
         response_data = {
-            "order_id": order.id,
+            "order_id": order["id"],
             "amount": int(total_amount * 100),
             "currency": "INR",
             "key_id": os.getenv("RAZORPAY_KEY_ID", "rzp_test_demo"),
@@ -1407,13 +2074,20 @@ async def create_enhanced_order(order_data: Dict[str, Any], current_user: User =
 # Include router
 app.include_router(api_router)
 
-# CORS middleware
+# CORS middleware. Fixed allowlists let Starlette answer with precomputed headers;
+# auth travels in the Authorization header, so credentialed CORS is not needed.
+CORS_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
+    if origin.strip()
+]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=CORS_ORIGINS,
+    allow_credentials=False,
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["Authorization", "Content-Type"],
 )
 
 # Configure logging
@@ -1422,6 +2096,24 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
-    if redis_available and redis_client:
-        redis_client.close()
\ No newline at end of file
+    await client.close()
+    bcrypt_pool.shutdown(wait=False)
+    if redis_client:
+        await redis_client.aclose()
+        await redis_pool.disconnect()
+    if redis_pubsub_client:
+        await redis_pubsub_client.aclose()
+
+if __name__ == "__main__":
+    import uvicorn
+    
+    # "auto" resolves to uvloop + httptools when installed (see requirements.txt).
+    # The Mongo and Redis clients are pool-friendly, so run one worker per CPU.
+    uvicorn.run(
+        "server:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", 8001)),
+        loop="auto",
+        http="auto",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+    )
@@ -1,83 +1,355 @@
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import unittest
-import json
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 import os
 import sys
 import time
-import random
-import string
-from datetime import datetime, timedelta
+import statistics
+import threading
+import secrets
+import logging
+from logging.handlers import MemoryHandler
 
-# Get the backend URL from the frontend .env file
-BACKEND_URL = "https://c119cd1a-33e0-4e79-80c7-34bcb843eacd.preview.emergentagent.com"
+# Target backend; point BACKEND_URL at a local server (e.g. http://localhost:8001)
+# to skip the internet round trip on every call
+BACKEND_URL = os.environ.get("BACKEND_URL", "https://c119cd1a-33e0-4e79-80c7-34bcb843eacd.preview.emergentagent.com").rstrip("/")
 API_URL = f"{BACKEND_URL}/api"
 
+# Optional pre-provisioned customer; when set, the suite logs straight in instead of
+# registering and verifying a fresh account every run
+TEST_CUSTOMER_EMAIL = os.environ.get("GRAINCRAFT_TEST_EMAIL")
+TEST_CUSTOMER_PASSWORD = os.environ.get("GRAINCRAFT_TEST_PASSWORD", "Test123!")
+
+# Fields every catalogue entry must carry
+GRAIN_FIELDS = frozenset(["id", "name", "description", "price_per_kg", "image_url", "category"])
+GRIND_OPTION_FIELDS = frozenset(["type", "description", "additional_cost", "processing_time_minutes"])
+DASHBOARD_FIELDS = frozenset(["total_orders", "total_customers", "total_grinding_stores", "total_delivery_boys"])
+
+# Static parts of the order payload; only the items depend on the live catalogue
+DELIVERY_ADDRESS = {
+    "street": "123 Test Street",
+    "city": "Test City",
+    "state": "Test State",
+    "zip": "12345",
+    "country": "Test Country"
+}
+ORDER_DELIVERY = {
+    "delivery_address": DELIVERY_ADDRESS,
+    "delivery_slot": "morning",
+    "delivery_date": "2025-02-20T10:00:00Z"
+}
+
+# Public smoke-test endpoints: required fields, plus any exact values expected
+SMOKE_ENDPOINTS = (
+    ("/health", frozenset(["status", "timestamp", "version"]), {"status": "healthy"}),
+    ("/metrics", frozenset(["total_users", "total_orders", "active_orders", "active_connections"]), {}),
+)
+
 # Set up logging
-import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-class GrainCraftAPITest(unittest.TestCase):
-    """Test suite for the GrainCraft API with enhanced features"""
+# Test progress output is buffered and written out in batches (at teardown, or once
+# the buffer fills); GRAINCRAFT_TEST_QUIET=1 silences it entirely
+log = logging.getLogger("graincraft.test")
+log.propagate = False
+log.setLevel(logging.WARNING if os.environ.get("GRAINCRAFT_TEST_QUIET") == "1" else logging.INFO)
+_log_stream = logging.StreamHandler(sys.stdout)
+_log_stream.setFormatter(logging.Formatter("%(message)s"))
+log_buffer = MemoryHandler(capacity=1000, flushLevel=logging.ERROR, target=_log_stream)
+log.addHandler(log_buffer)
 
-    def setUp(self):
-        """Setup before each test"""
-        self.admin_credentials = {
-            "email": "admin@graincraft.com",
-            "password": "admin123"
-        }
-        self.customer_credentials = None
-        self.admin_token = None
-        self.customer_token = None
-        self.test_email = f"test_user_{int(time.time())}@example.com"
-        self.test_password = "Test123!"
-        self.cart_items = []
+# Server-side latency of every call made by the suites, keyed by (method, path)
+RESPONSE_TIMES = defaultdict(list)
+# Cached endpoints whose best/worst latency ratio is reported as the cache speedup
+CACHED_ENDPOINTS = (("GET", "/api/grains"), ("GET", "/api/orders/my-orders"))
+
+def record_response_time(response, *args, **kwargs):
+    """Session response hook that files each call's elapsed time under its endpoint"""
+    RESPONSE_TIMES[(response.request.method, urlsplit(response.url).path)].append(response.elapsed.total_seconds())
+
+def tearDownModule():
+    """Print the per-endpoint latency percentiles gathered over the whole run"""
+    if not RESPONSE_TIMES:
+        return
+    log.info("\n📊 Response times (seconds):")
+    for (method, path), samples in sorted(RESPONSE_TIMES.items(), key=lambda item: item[0][1]):
+        if len(samples) > 1:
+            cuts = statistics.quantiles(samples, n=100, method="inclusive")
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = samples[0]
+        log.info(f"{method:6} {path:45} n={len(samples):3} min={min(samples):.4f} p50={p50:.4f} p95={p95:.4f} p99={p99:.4f} max={max(samples):.4f}")
+    for method, path in CACHED_ENDPOINTS:
+        samples = RESPONSE_TIMES.get((method, path))
+        if samples and len(samples) > 1 and max(samples) > 0:
+            log.info(f"Cache speedup {method} {path}: min/max = {min(samples) / max(samples):.2f}")
+    log_buffer.flush()
+
+
+# Stay just under the server's 100 requests/minute per-client limit so the suite
+# never trips 429s, however many tests share the window. pytest-xdist workers share
+# the same client address, so each one takes an equal slice of the budget
+THROTTLE_WORKERS = int(os.environ.get("PYTEST_XDIST_WORKER_COUNT", 1))
+THROTTLE_CAPACITY = max(1, 90 // THROTTLE_WORKERS)
+THROTTLE_RATE = THROTTLE_CAPACITY / 60  # tokens per second
+
+class TokenBucket:
+    """Thread-safe client-side token bucket; acquire() blocks until a token is free"""
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            if self.tokens < 1:
+                # Sleep holding the lock so waiting threads are served in turn
+                time.sleep((1 - self.tokens) / self.rate)
+                self.tokens = 1.0
+                self.last_refill = time.monotonic()
+            self.tokens -= 1
+
+# Shared by every session in the process, since the server counts per client address
+request_bucket = TokenBucket(THROTTLE_CAPACITY, THROTTLE_RATE)
+
+class ThrottledSession(requests.Session):
+    """Session that takes a token from the shared bucket before every request"""
+
+    def request(self, *args, **kwargs):
+        request_bucket.acquire()
+        return super().request(*args, **kwargs)
+
+# Run serially with `python backend_test.py`, or spread the suites over workers with
+# `pytest -n auto --dist=loadscope backend_test.py` (pytest-xdist). loadscope keeps
+# each class on one worker, so the ordered account flow stays sequential. While
+# iterating, `pytest --lf -x backend_test.py` reruns only the tests that failed last
+# time; the lazy _require_* helpers log in for whichever tests are selected.
+class APITestCase(unittest.TestCase):
+    """Shared HTTP session and catalogue cache for the GrainCraft API suites"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Share one keep-alive session so tests reuse the TCP/TLS connection"""
+        cls.session = ThrottledSession()
+        # Pooled connections, with a short backoff retry on transient gateway errors
+        # (idempotent methods only, urllib3's default)
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=20,
+            max_retries=Retry(total=2, backoff_factor=0.1, status_forcelist=[502, 503, 504])
+        )
+        cls.session.mount("http://", adapter)
+        cls.session.mount("https://", adapter)
+        cls.session.headers.update({"User-Agent": "graincraft-tests/1.0"})
+        cls.session.hooks["response"].append(record_response_time)
+        
+        # Catalogue data reused by the order and cart tests
+        cls.grains = None
+        cls.grind_options = None
+        
+        # Warm the server-side caches so whichever test runs first doesn't pay the
+        # cold miss; keep the catalogue bodies so the helpers needn't refetch them
+        for path, attr in (("/grains", "grains"), ("/grind-options", "grind_options"), ("/metrics", None)):
+            response = cls.session.get(f"{API_URL}{path}")
+            if attr and response.status_code == 200:
+                setattr(cls, attr, orjson.loads(response.content))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.session.close()
+        log_buffer.flush()
+
+    def _check_status(self, response, code=200):
+        """Fail unless the response carries the expected status; a bare compare when it does"""
+        if response.status_code != code:
+            self.fail(f"Expected status code {code}, got {response.status_code}: {response.text}")
+
+    def _ok(self, response):
+        """Assert a 200 response and return its decoded body"""
+        self._check_status(response)
+        return orjson.loads(response.content)
+
+    def _post_json(self, path, payload, headers=None):
+        """POST an orjson-encoded body to an API path"""
+        return self.session.post(
+            f"{API_URL}{path}",
+            data=orjson.dumps(payload),
+            headers={**(headers or {}), "Content-Type": "application/json"}
+        )
+
+    def _assert_fields(self, records, fields, label):
+        """Assert every record carries all of the given fields"""
+        missing = [(i, set(fields - record.keys())) for i, record in enumerate(records) if not fields <= record.keys()]
+        self.assertFalse(missing, f"{label} missing fields: {missing}")
+
+    def _get_grains(self):
+        """Fetch the grain catalogue once per run for tests that only need its data"""
+        if self.grains is None:
+            response = self.session.get(f"{API_URL}/grains")
+            type(self).grains = self._ok(response)
+        return self.grains
+
+    def _get_grind_options(self):
+        """Fetch the grind options once per run for tests that only need their data"""
+        if self.grind_options is None:
+            response = self.session.get(f"{API_URL}/grind-options")
+            type(self).grind_options = self._ok(response)
+        return self.grind_options
+
+class GrainCraftPublicAPITest(APITestCase):
+    """Read-only public endpoints, independent of the account flow below"""
+
+    def test_01_smoke_endpoints(self):
+        """Test the health and metrics endpoints return their expected fields"""
+        # The probes are independent, so fetch them together and check them afterwards
+        with ThreadPoolExecutor(max_workers=len(SMOKE_ENDPOINTS)) as executor:
+            responses = list(executor.map(lambda endpoint: self.session.get(f"{API_URL}{endpoint[0]}"), SMOKE_ENDPOINTS))
+        
+        for (path, fields, expected), response in zip(SMOKE_ENDPOINTS, responses):
+            with self.subTest(path=path):
+                log.info(f"\n🔍 Testing GET /api{path}...")
+                data = self._ok(response)
+                self._assert_fields([data], fields, path)
+                for key, value in expected.items():
+                    self.assertEqual(data[key], value, f"Expected {key} to be {value!r}")
+                log.info(f"✅ GET /api{path} test passed")
 
-    def test_01_health_check(self):
-        """Test the health check endpoint"""
-        print("\n🔍 Testing GET /api/health...")
-        response = requests.get(f"{API_URL}/health")
+    def test_07_get_grains(self):
+        """Test GET /api/grains endpoint with Redis caching"""
+        log.info("\n🔍 Testing GET /api/grains with caching...")
+        
+        # First request should hit the database
+        response1 = self.session.get(f"{API_URL}/grains")
+        
+        grains1 = self._ok(response1)
+        
+        # Second request should hit the cache and be faster
+        response2 = self.session.get(f"{API_URL}/grains")
+        
+        self._check_status(response2)
         
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
-        data = response.json()
-        self.assertEqual(data["status"], "healthy", "Expected status to be 'healthy'")
-        self.assertIn("timestamp", data, "Expected timestamp in response")
-        self.assertIn("version", data, "Expected version in response")
+        # Verify both responses are identical; the server serves the cached body
+        # verbatim, so comparing raw bytes is enough and skips a second parse
+        self.assertEqual(response1.content, response2.content, "Expected identical responses from cache")
         
-        print("✅ GET /api/health test passed")
+        # Check if all required fields are present in each grain
+        self._assert_fields(grains1, GRAIN_FIELDS, "Grains")
+        
+        type(self).grains = grains1
+        log.info(f"✅ GET /api/grains test passed (First request: {response1.elapsed.total_seconds():.4f}s, Second request: {response2.elapsed.total_seconds():.4f}s)")
 
-    def test_02_metrics(self):
-        """Test the metrics endpoint"""
-        print("\n🔍 Testing GET /api/metrics...")
-        response = requests.get(f"{API_URL}/metrics")
+    def test_08_rate_limiting(self):
+        """Test rate limiting middleware"""
+        log.info("\n🔍 Testing rate limiting middleware...")
         
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
-        data = response.json()
-        self.assertIn("total_users", data, "Expected total_users in response")
-        self.assertIn("total_orders", data, "Expected total_orders in response")
-        self.assertIn("active_orders", data, "Expected active_orders in response")
-        self.assertIn("active_connections", data, "Expected active_connections in response")
+        # Fire a concurrent burst, as real clients would, to test rate limiting
+        num_requests = 10
+        with ThreadPoolExecutor(max_workers=num_requests) as executor:
+            responses = [
+                response.status_code
+                for response in executor.map(lambda _: self.session.get(f"{API_URL}/grains"), range(num_requests))
+            ]
+        
+        for i, code in enumerate(responses):
+            log.info(f"Request {i+1}: Status code {code}")
         
-        print("✅ GET /api/metrics test passed")
+        # All requests should succeed as we're under the limit (100 per minute)
+        self.assertTrue(all(code == 200 for code in responses), "Expected all requests to succeed")
+        
+        log.info("✅ Rate limiting test passed (all requests succeeded)")
+
+    def test_12_get_grind_options(self):
+        """Test getting grind options"""
+        log.info("\n🔍 Testing GET /api/grind-options...")
+        
+        response = self.session.get(f"{API_URL}/grind-options")
+        
+        options = self._ok(response)
+        
+        # Verify structure of grind options
+        self.assertTrue(len(options) > 0, "Expected at least one grind option")
+        self._assert_fields(options, GRIND_OPTION_FIELDS, "Grind options")
+        
+        type(self).grind_options = options
+        log.info("✅ GET /api/grind-options test passed")
+
+class GrainCraftAPITest(APITestCase):
+    """Test suite for the GrainCraft API with enhanced features"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        
+        # Accounts and tokens are shared by every test, so each login happens once.
+        # The random email suffix keeps parallel workers and reruns from colliding.
+        cls.admin_credentials = {
+            "email": os.environ.get("ADMIN_EMAIL", "admin@graincraft.com"),
+            "password": os.environ.get("ADMIN_PASSWORD", "admin123")
+        }
+        cls.customer_credentials = (
+            {"email": TEST_CUSTOMER_EMAIL, "password": TEST_CUSTOMER_PASSWORD} if TEST_CUSTOMER_EMAIL else None
+        )
+        cls.admin_token = None
+        cls.customer_token = None
+        cls.order_id = None
+        cls.razorpay_order_id = None
+        cls.test_email = f"test_user_{int(time.time())}_{secrets.token_hex(4)}@example.com"
+        cls.test_password = TEST_CUSTOMER_PASSWORD
+
+    def setUp(self):
+        """Setup before each test"""
+        self.cart_items = []
+
+    def _require_admin_token(self):
+        """Log in as admin once per run and reuse the token"""
+        if not self.admin_token:
+            self._do_admin_login()
+        return self.admin_token
+
+    def _require_customer_token(self):
+        """Register and log in the test customer once per run and reuse the token"""
+        if not self.customer_token:
+            self._do_customer_login()
+        return self.customer_token
 
     def test_03_admin_login(self):
         """Test admin login"""
-        print("\n🔍 Testing POST /api/auth/login (admin)...")
-        response = requests.post(f"{API_URL}/auth/login", json=self.admin_credentials)
+        self._do_admin_login()
+
+    def _do_admin_login(self):
+        """Log in as admin and share the token with the rest of the class"""
+        log.info("\n🔍 Testing POST /api/auth/login (admin)...")
+        response = self._post_json("/auth/login", self.admin_credentials)
         
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
-        data = response.json()
+        data = self._ok(response)
         self.assertIn("access_token", data, "Expected access_token in response")
         self.assertIn("user", data, "Expected user data in response")
         self.assertEqual(data["user"]["role"], "admin", "Expected role to be 'admin'")
         
         # Save admin token for later tests
-        self.admin_token = data["access_token"]
+        type(self).admin_token = data["access_token"]
         
-        print("✅ POST /api/auth/login (admin) test passed")
+        log.info("✅ POST /api/auth/login (admin) test passed")
 
+    @unittest.skipIf(TEST_CUSTOMER_EMAIL, "using the pre-provisioned test customer")
     def test_04_register_customer(self):
         """Test customer registration"""
-        print("\n🔍 Testing POST /api/auth/register...")
+        self._do_register_customer()
+
+    def _do_register_customer(self):
+        """Register the test customer and share its credentials with the class"""
+        log.info("\n🔍 Testing POST /api/auth/register...")
         
         customer_data = {
             "email": self.test_email,
@@ -88,120 +360,77 @@ class GrainCraftAPITest(unittest.TestCase):
             "role": "customer"
         }
         
-        response = requests.post(f"{API_URL}/auth/register", json=customer_data)
+        response = self._post_json("/auth/register", customer_data)
         
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
-        data = response.json()
+        data = self._ok(response)
         self.assertIn("message", data, "Expected message in response")
         
         # Save customer credentials for later tests
-        self.customer_credentials = {
+        type(self).customer_credentials = {
             "email": customer_data["email"],
             "password": customer_data["password"]
         }
         
-        print("✅ POST /api/auth/register test passed")
+        log.info("✅ POST /api/auth/register test passed")
 
+    @unittest.skipIf(TEST_CUSTOMER_EMAIL, "using the pre-provisioned test customer")
     def test_05_verify_otp(self):
         """Test OTP verification"""
-        print("\n🔍 Testing POST /api/auth/verify-otp...")
+        self._do_verify_otp()
+
+    def _do_verify_otp(self):
+        """Verify the test customer's OTP, registering it first if needed"""
+        log.info("\n🔍 Testing POST /api/auth/verify-otp...")
         
         if not self.customer_credentials:
-            self.test_04_register_customer()
+            self._do_register_customer()
         
         otp_data = {
             "email": self.customer_credentials["email"],
             "otp": "123456"  # Using the demo OTP
         }
         
-        response = requests.post(f"{API_URL}/auth/verify-otp", json=otp_data)
+        response = self._post_json("/auth/verify-otp", otp_data)
         
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
-        data = response.json()
+        data = self._ok(response)
         self.assertIn("message", data, "Expected message in response")
         
-        print("✅ POST /api/auth/verify-otp test passed")
+        log.info("✅ POST /api/auth/verify-otp test passed")
 
     def test_06_customer_login(self):
         """Test customer login"""
-        print("\n🔍 Testing POST /api/auth/login (customer)...")
+        self._do_customer_login()
+
+    def _do_customer_login(self):
+        """Log in as the test customer and share the token with the class"""
+        log.info("\n🔍 Testing POST /api/auth/login (customer)...")
         
         if not self.customer_credentials:
-            self.test_04_register_customer()
-            self.test_05_verify_otp()
+            self._do_register_customer()
+            self._do_verify_otp()
         
-        response = requests.post(f"{API_URL}/auth/login", json=self.customer_credentials)
+        response = self._post_json("/auth/login", self.customer_credentials)
         
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
-        data = response.json()
+        data = self._ok(response)
         self.assertIn("access_token", data, "Expected access_token in response")
         self.assertIn("user", data, "Expected user data in response")
         self.assertEqual(data["user"]["role"], "customer", "Expected role to be 'customer'")
         
         # Save customer token for later tests
-        self.customer_token = data["access_token"]
-        
-        print("✅ POST /api/auth/login (customer) test passed")
-
-    def test_07_get_grains(self):
-        """Test GET /api/grains endpoint with Redis caching"""
-        print("\n🔍 Testing GET /api/grains with caching...")
-        
-        # First request should hit the database
-        start_time = time.time()
-        response1 = requests.get(f"{API_URL}/grains")
-        first_request_time = time.time() - start_time
-        
-        self.assertEqual(response1.status_code, 200, "Expected status code 200")
-        grains1 = response1.json()
-        
-        # Second request should hit the cache and be faster
-        start_time = time.time()
-        response2 = requests.get(f"{API_URL}/grains")
-        second_request_time = time.time() - start_time
-        
-        self.assertEqual(response2.status_code, 200, "Expected status code 200")
-        grains2 = response2.json()
-        
-        # Verify both responses are identical
-        self.assertEqual(grains1, grains2, "Expected identical responses from cache")
-        
-        # Check if all required fields are present in each grain
-        required_fields = ["id", "name", "description", "price_per_kg", "image_url", "category"]
-        for grain in grains1:
-            for field in required_fields:
-                self.assertIn(field, grain, f"Field '{field}' missing in grain")
+        type(self).customer_token = data["access_token"]
         
-        print(f"✅ GET /api/grains test passed (First request: {first_request_time:.4f}s, Second request: {second_request_time:.4f}s)")
-        return grains1
-
-    def test_08_rate_limiting(self):
-        """Test rate limiting middleware"""
-        print("\n🔍 Testing rate limiting middleware...")
-        
-        # Make multiple requests to test rate limiting
-        num_requests = 10
-        responses = []
-        
-        for i in range(num_requests):
-            response = requests.get(f"{API_URL}/grains")
-            responses.append(response.status_code)
-            print(f"Request {i+1}: Status code {response.status_code}")
-        
-        # All requests should succeed as we're under the limit (100 per minute)
-        self.assertTrue(all(code == 200 for code in responses), "Expected all requests to succeed")
-        
-        print("✅ Rate limiting test passed (all requests succeeded)")
+        log.info("✅ POST /api/auth/login (customer) test passed")
 
     def test_09_create_order(self):
         """Test order creation and payment flow"""
-        print("\n🔍 Testing order creation flow...")
-        
-        if not self.customer_token:
-            self.test_06_customer_login()
+        self._do_create_order()
+
+    def _do_create_order(self):
+        """Place a one-item order and share its ids with the class"""
+        log.info("\n🔍 Testing order creation flow...")
         
         # Get available grains
-        grains = self.test_07_get_grains()
+        grains = self._get_grains()
         
         # Create order payload
         order_items = [
@@ -213,138 +442,84 @@ class GrainCraftAPITest(unittest.TestCase):
                 "total_price": grains[0]["price_per_kg"] * 2.5
             }
         ]
-        
-        delivery_address = {
-            "street": "123 Test Street",
-            "city": "Test City",
-            "state": "Test State",
-            "zip": "12345",
-            "country": "Test Country"
-        }
-        
-        order_data = {
-            "items": order_items,
-            "delivery_address": delivery_address,
-            "delivery_slot": "morning",
-            "delivery_date": "2025-02-20T10:00:00Z"
-        }
+        order_data = {"items": order_items, **ORDER_DELIVERY}
         
         # Create order
-        headers = {"Authorization": f"Bearer {self.customer_token}"}
-        response = requests.post(f"{API_URL}/orders", json=order_data, headers=headers)
+        headers = {"Authorization": f"Bearer {self._require_customer_token()}"}
+        response = self._post_json("/orders", order_data, headers)
         
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
-        order_response = response.json()
+        order_response = self._ok(response)
         self.assertIn("order_id", order_response, "Expected order_id in response")
         self.assertIn("razorpay_order_id", order_response, "Expected razorpay_order_id in response")
         
         # Save order ID for later tests
-        self.order_id = order_response["order_id"]
-        self.razorpay_order_id = order_response["razorpay_order_id"]
+        type(self).order_id = order_response["order_id"]
+        type(self).razorpay_order_id = order_response["razorpay_order_id"]
         
-        print("✅ Order creation test passed")
+        log.info("✅ Order creation test passed")
         return order_response
 
     def test_10_verify_payment(self):
         """Test payment verification"""
-        print("\n🔍 Testing payment verification...")
+        log.info("\n🔍 Testing payment verification...")
         
-        if not hasattr(self, 'razorpay_order_id'):
-            order_response = self.test_09_create_order()
-            self.razorpay_order_id = order_response["razorpay_order_id"]
+        if not self.razorpay_order_id:
+            self._do_create_order()
         
         # Create mock payment verification data
         payment_data = {
             "razorpay_order_id": self.razorpay_order_id,
-            "razorpay_payment_id": f"pay_{random_string(14)}",
+            "razorpay_payment_id": f"pay_{secrets.token_hex(7)}",
             "razorpay_signature": "mock_signature"  # This will be validated by the server
         }
         
-        response = requests.post(f"{API_URL}/orders/verify-payment", json=payment_data)
+        response = self._post_json("/orders/verify-payment", payment_data)
         
         # Note: This might fail in a real environment due to signature validation
         # but we're testing the API structure
-        print(f"Payment verification response: {response.status_code} - {response.text}")
+        log.info(f"Payment verification response: {response.status_code} - {response.text}")
         
         # Even if it fails, we can check if the endpoint exists
-        self.assertIn(response.status_code, [200, 400], "Expected status code 200 or 400")
+        self.assertIn(response.status_code, {200, 400}, "Expected status code 200 or 400")
         
-        print("✅ Payment verification test completed")
+        log.info("✅ Payment verification test completed")
 
     def test_11_get_my_orders(self):
         """Test getting customer orders with caching"""
-        print("\n🔍 Testing GET /api/orders/my-orders with caching...")
-        
-        if not self.customer_token:
-            self.test_06_customer_login()
+        log.info("\n🔍 Testing GET /api/orders/my-orders with caching...")
         
-        headers = {"Authorization": f"Bearer {self.customer_token}"}
+        headers = {"Authorization": f"Bearer {self._require_customer_token()}"}
         
         # First request should hit the database
-        start_time = time.time()
-        response1 = requests.get(f"{API_URL}/orders/my-orders", headers=headers)
-        first_request_time = time.time() - start_time
+        response1 = self.session.get(f"{API_URL}/orders/my-orders", headers=headers)
         
-        self.assertEqual(response1.status_code, 200, "Expected status code 200")
+        self._check_status(response1)
         
         # Second request should hit the cache and be faster
-        start_time = time.time()
-        response2 = requests.get(f"{API_URL}/orders/my-orders", headers=headers)
-        second_request_time = time.time() - start_time
+        response2 = self.session.get(f"{API_URL}/orders/my-orders", headers=headers)
         
-        self.assertEqual(response2.status_code, 200, "Expected status code 200")
+        self._check_status(response2)
         
-        print(f"✅ GET /api/orders/my-orders test passed (First request: {first_request_time:.4f}s, Second request: {second_request_time:.4f}s)")
-
-    def test_12_get_grind_options(self):
-        """Test getting grind options"""
-        print("\n🔍 Testing GET /api/grind-options...")
-        
-        response = requests.get(f"{API_URL}/grind-options")
-        
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
-        options = response.json()
-        
-        # Verify structure of grind options
-        self.assertTrue(len(options) > 0, "Expected at least one grind option")
-        required_fields = ["type", "description", "additional_cost", "processing_time_minutes"]
-        for option in options:
-            for field in required_fields:
-                self.assertIn(field, option, f"Field '{field}' missing in grind option")
-        
-        print("✅ GET /api/grind-options test passed")
-        return options
+        log.info(f"✅ GET /api/orders/my-orders test passed (First request: {response1.elapsed.total_seconds():.4f}s, Second request: {response2.elapsed.total_seconds():.4f}s)")
 
     def test_13_cart_operations(self):
         """Test cart operations (add, get, remove, clear)"""
-        print("\n🔍 Testing cart operations...")
+        log.info("\n🔍 Testing cart operations...")
         
-        if not self.customer_token:
-            self.test_06_customer_login()
-        
-        headers = {"Authorization": f"Bearer {self.customer_token}"}
+        headers = {"Authorization": f"Bearer {self._require_customer_token()}"}
         
         # Get available grains
-        grains = self.test_07_get_grains()
-        grind_options = self.test_12_get_grind_options()
+        grains = self._get_grains()
+        grind_options = self._get_grind_options()
         
-        # 1. Add individual grain to cart
-        print("Adding individual grain to cart...")
+        # 1. Individual grain and 2. custom mix, added concurrently since neither depends on the other
+        log.info("Adding individual grain and custom mix to cart...")
         individual_item = {
             "type": "individual",
             "grain_id": grains[0]["id"],
             "quantity_kg": 1.5,
             "grind_option": grind_options[1]  # Use the second grind option
         }
-        
-        response = requests.post(f"{API_URL}/cart/add", json=individual_item, headers=headers)
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
-        cart_item = response.json()
-        self.assertIn("id", cart_item, "Expected id in response")
-        self.cart_items.append(cart_item["id"])
-        
-        # 2. Add custom mix to cart
-        print("Adding custom mix to cart...")
         mix_item = {
             "type": "mix",
             "grains": [
@@ -364,77 +539,69 @@ class GrainCraftAPITest(unittest.TestCase):
             "grind_option": grind_options[2]  # Use the third grind option
         }
         
-        response = requests.post(f"{API_URL}/cart/add", json=mix_item, headers=headers)
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
-        cart_item = response.json()
-        self.assertIn("id", cart_item, "Expected id in response")
-        self.cart_items.append(cart_item["id"])
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            responses = list(executor.map(
+                lambda item: self._post_json("/cart/add", item, headers),
+                (individual_item, mix_item)
+            ))
+        for response in responses:
+            cart_item = self._ok(response)
+            self.assertIn("id", cart_item, "Expected id in response")
+            self.cart_items.append(cart_item["id"])
         
         # 3. Get cart
-        print("Getting cart...")
-        response = requests.get(f"{API_URL}/cart", headers=headers)
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
-        cart = response.json()
+        log.info("Getting cart...")
+        response = self.session.get(f"{API_URL}/cart", headers=headers)
+        cart = self._ok(response)
         self.assertTrue(len(cart) >= 2, "Expected at least 2 items in cart")
         
         # 4. Remove one item from cart
         if len(self.cart_items) > 0:
-            print(f"Removing item {self.cart_items[0]} from cart...")
-            response = requests.delete(f"{API_URL}/cart/{self.cart_items[0]}", headers=headers)
-            self.assertEqual(response.status_code, 200, "Expected status code 200")
+            log.info(f"Removing item {self.cart_items[0]} from cart...")
+            response = self.session.delete(f"{API_URL}/cart/{self.cart_items[0]}", headers=headers)
+            self._check_status(response)
             
             # Verify item was removed
-            response = requests.get(f"{API_URL}/cart", headers=headers)
-            self.assertEqual(response.status_code, 200, "Expected status code 200")
-            cart = response.json()
+            response = self.session.get(f"{API_URL}/cart", headers=headers)
+            cart = self._ok(response)
             item_ids = [item["id"] for item in cart]
             self.assertNotIn(self.cart_items[0], item_ids, "Expected item to be removed from cart")
         
         # 5. Clear cart
-        print("Clearing cart...")
-        response = requests.delete(f"{API_URL}/cart", headers=headers)
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
+        log.info("Clearing cart...")
+        response = self.session.delete(f"{API_URL}/cart", headers=headers)
+        self._check_status(response)
         
         # Verify cart is empty
-        response = requests.get(f"{API_URL}/cart", headers=headers)
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
-        cart = response.json()
+        response = self.session.get(f"{API_URL}/cart", headers=headers)
+        cart = self._ok(response)
         self.assertEqual(len(cart), 0, "Expected empty cart")
         
-        print("✅ Cart operations test passed")
+        log.info("✅ Cart operations test passed")
 
     def test_14_admin_dashboard(self):
         """Test admin dashboard"""
-        print("\n🔍 Testing GET /api/admin/dashboard...")
+        log.info("\n🔍 Testing GET /api/admin/dashboard...")
         
-        if not self.admin_token:
-            self.test_03_admin_login()
-        
-        headers = {"Authorization": f"Bearer {self.admin_token}"}
+        headers = {"Authorization": f"Bearer {self._require_admin_token()}"}
         
-        response = requests.get(f"{API_URL}/admin/dashboard", headers=headers)
+        response = self.session.get(f"{API_URL}/admin/dashboard", headers=headers)
         
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
-        data = response.json()
+        data = self._ok(response)
         
-        required_fields = ["total_orders", "total_customers", "total_grinding_stores", "total_delivery_boys"]
-        for field in required_fields:
-            self.assertIn(field, data, f"Field '{field}' missing in dashboard data")
+        self._assert_fields([data], DASHBOARD_FIELDS, "Dashboard data")
         
-        print("✅ GET /api/admin/dashboard test passed")
+        log.info("✅ GET /api/admin/dashboard test passed")
 
     def test_16_cart_objectid_serialization(self):
         """Test cart operations with ObjectId serialization fixes"""
-        print("\n🔍 Testing cart operations with ObjectId serialization...")
-        
-        if not self.customer_token:
-            self.test_06_customer_login()
+        log.info("\n🔍 Testing cart operations with ObjectId serialization...")
         
-        headers = {"Authorization": f"Bearer {self.customer_token}"}
+        headers = {"Authorization": f"Bearer {self._require_customer_token()}"}
         
         # Get available grains
-        grains = self.test_07_get_grains()
-        grind_options = self.test_12_get_grind_options()
+        grains = self._get_grains()
+        grind_options = self._get_grind_options()
         
         # Add multiple items to cart
         for i in range(3):
@@ -445,14 +612,13 @@ class GrainCraftAPITest(unittest.TestCase):
                 "grind_option": grind_options[i % len(grind_options)]
             }
             
-            response = requests.post(f"{API_URL}/cart/add", json=item, headers=headers)
-            self.assertEqual(response.status_code, 200, f"Expected status code 200, got {response.status_code}")
-            logging.info(f"Added item to cart: {response.json()}")
+            response = self._post_json("/cart/add", item, headers)
+            self._check_status(response)
+            log.info(f"Added item to cart: {response.text}")
         
         # Get cart and verify items
-        response = requests.get(f"{API_URL}/cart", headers=headers)
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
-        cart = response.json()
+        response = self.session.get(f"{API_URL}/cart", headers=headers)
+        cart = self._ok(response)
         
         # Verify cart items have proper serialization
         for item in cart:
@@ -462,24 +628,20 @@ class GrainCraftAPITest(unittest.TestCase):
             self.assertIsInstance(item["user_id"], str, "Expected user_id to be a string")
         
         # Clear cart
-        response = requests.delete(f"{API_URL}/cart", headers=headers)
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
+        response = self.session.delete(f"{API_URL}/cart", headers=headers)
+        self._check_status(response)
         
-        print("✅ Cart ObjectId serialization test passed")
+        log.info("✅ Cart ObjectId serialization test passed")
 
     def test_17_order_objectid_serialization(self):
         """Test order operations with ObjectId serialization fixes"""
-        print("\n🔍 Testing order operations with ObjectId serialization...")
+        log.info("\n🔍 Testing order operations with ObjectId serialization...")
         
-        if not self.customer_token:
-            self.test_06_customer_login()
-        
-        headers = {"Authorization": f"Bearer {self.customer_token}"}
+        headers = {"Authorization": f"Bearer {self._require_customer_token()}"}
         
         # Get orders
-        response = requests.get(f"{API_URL}/orders/my-orders", headers=headers)
-        self.assertEqual(response.status_code, 200, "Expected status code 200")
-        orders = response.json()
+        response = self.session.get(f"{API_URL}/orders/my-orders", headers=headers)
+        orders = self._ok(response)
         
         # Verify order objects have proper serialization
         for order in orders:
@@ -488,14 +650,10 @@ class GrainCraftAPITest(unittest.TestCase):
             self.assertIn("customer_id", order, "Expected customer_id in order")
             self.assertIsInstance(order["customer_id"], str, "Expected customer_id to be a string")
         
-        print("✅ Order ObjectId serialization test passed")
-
-def random_string(length):
-    """Generate a random string of fixed length"""
-    letters = string.ascii_lowercase + string.digits
-    return ''.join(random.choice(letters) for i in range(length))
+        log.info("✅ Order ObjectId serialization test passed")
 
 if __name__ == "__main__":
-    print("🧪 Starting GrainCraft API Tests")
+    log.info("🧪 Starting GrainCraft API Tests")
     unittest.main(argv=['first-arg-is-ignored'], exit=False)
-    print("🎉 All tests completed!")
\ No newline at end of file
+    log.info("🎉 All tests completed!")
+    log_buffer.flush()
\ No newline at end of file
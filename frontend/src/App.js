@@ -83,14 +83,18 @@ const useWebSocket = (userId) => {
     ws.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data);
-        setNotifications(prev => [...prev, data]);
-        
+        // Messages sent within a short window arrive together as one batch
+        const items = data.type === 'batch' ? data.items : [data];
+        setNotifications(prev => [...prev, ...items]);
+
         // Show browser notification if permission granted
         if (Notification.permission === 'granted') {
-          new Notification(data.type === 'order_update' ? 'Order Update' : 'GrainCraft', {
-            body: data.message,
-            icon: '/logo192.png',
-            tag: 'graincraft-notification'
+          items.forEach(item => {
+            new Notification(item.type === 'order_update' ? 'Order Update' : 'GrainCraft', {
+              body: item.message,
+              icon: '/logo192.png',
+              tag: 'graincraft-notification'
+            });
           });
         }
       } catch (error) {